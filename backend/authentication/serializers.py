@@ -1,3 +1,5 @@
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
 from rest_framework import serializers
 from django.contrib.auth.models import User
 from django.contrib.auth import authenticate
@@ -65,3 +67,10 @@ class UserProfileSerializer(serializers.ModelSerializer):
         model = UserProfile
         fields = ('user_id', 'username', 'email', 'full_name', 'timezone', 'created_at')
         read_only_fields = ('created_at',)
+
+    def validate_timezone(self, value):
+        try:
+            ZoneInfo(value)
+        except (ZoneInfoNotFoundError, ValueError):
+            raise serializers.ValidationError("Unknown time zone")
+        return value
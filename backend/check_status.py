@@ -12,14 +12,15 @@ sys.path.append('/app')
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'freetimefinder.settings')
 django.setup()
 
-from schedules.models import Group, GroupAvailability, Availability
+from schedules.models import Group, GroupAvailabilityState, Availability
+from schedules.availability import expand_group_availability
 from django.contrib.auth.models import User
 
 def check_group_status():
     """Check the status of groups and their availability"""
     print("=== GROUP STATUS ===")
     print(f"Total Groups: {Group.objects.count()}")
-    print(f"Total Group Availabilities: {GroupAvailability.objects.count()}")
+    print(f"Total Computed Group Weeks: {GroupAvailabilityState.objects.count()}")
     print(f"Total User Availabilities: {Availability.objects.count()}")
     print(f"Total Users: {User.objects.count()}")
     print()
@@ -42,12 +43,13 @@ def check_group_status():
             print(f"    {member.username}: {member_avail} availability slots")
         
         # Check group availability
-        group_avail = GroupAvailability.objects.filter(group=group).count()
-        print(f"  Common availability slots: {group_avail}")
+        state = GroupAvailabilityState.objects.filter(group=group).first()
+        common_slots = expand_group_availability(state) if state else []
+        print(f"  Common availability slots: {len(common_slots)}")
         
-        if group_avail > 0:
+        if common_slots:
             print("  Sample common slots:")
-            for slot in GroupAvailability.objects.filter(group=group)[:5]:
+            for slot in common_slots[:5]:
                 print(f"    {slot.get_day_of_week_display()} {slot.start_time}-{slot.end_time} ({slot.member_count} members)")
         
         print()
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
+import tempfile
 from pathlib import Path
 from decouple import config, Csv
 from datetime import timedelta
@@ -151,6 +152,19 @@ REST_FRAMEWORK = {
     'PAGE_SIZE': 20
 }
 
+# Group free time recompute
+# When enabled, write paths only queue a recompute job and the
+# `run_recompute_worker` management command does the work off the request path.
+RECOMPUTE_IN_BACKGROUND = config('RECOMPUTE_IN_BACKGROUND', default=False, cast=bool)
+
+# Lock files that let concurrent requests (across threads and worker processes
+# on this host) share a single recompute of the same group.
+RECOMPUTE_LOCK_DIR = config('RECOMPUTE_LOCK_DIR', default=str(Path(tempfile.gettempdir()) / 'freetimefinder-locks'))
+
+# Merge each user's adjacent and overlapping busy times into one row per block
+# on write (see schedules.coalesce); `compact_busy_times` merges existing rows.
+BUSY_TIME_COALESCE = config('BUSY_TIME_COALESCE', default=False, cast=bool)
+
 # JWT Configuration
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=60),
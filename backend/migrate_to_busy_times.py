@@ -1,7 +1,8 @@
 #!/usr/bin/env python
 """
 Migration script to help users understand the new busy time system.
-This script provides information about the change from availability-based to busy-time-based scheduling.
+This script provides information about the change from availability-based to busy-time-based scheduling
+and converts existing availability data into busy times.
 """
 
 import os
@@ -14,8 +15,8 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'freetimefinder.settings')
 django.setup()
 
 from django.contrib.auth.models import User
+from django.core.management import call_command
 from schedules.models import Availability, BusyTime, Group
-from schedules.views import calculate_group_free_time
 
 
 def main():
@@ -58,17 +59,9 @@ def main():
     print("   • Red cells = Busy, Green cells = Free for everyone")
     print()
     
-    # Recalculate all group free times
-    print("🔄 Recalculating group free times...")
-    groups_updated = 0
-    for group in Group.objects.all():
-        try:
-            calculate_group_free_time(group)
-            groups_updated += 1
-        except Exception as e:
-            print(f"   ⚠️  Error updating group '{group.name}': {e}")
-    
-    print(f"   ✅ Updated {groups_updated} groups")
+    # Turn old availability into busy times; the affected groups are rebuilt once at the end
+    print("🔄 Converting old availability data into busy times...")
+    call_command('convert_availability')
     print()
     
     print("✅ MIGRATION COMPLETE!")
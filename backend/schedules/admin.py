@@ -1,5 +1,7 @@
 from django.contrib import admin
-from .models import Group, Availability, Event, GroupAvailability
+from .models import (
+    Group, Availability, BusyProfile, Event, GroupAvailabilityState, RecomputeJob
+)
 
 
 @admin.register(Group)
@@ -28,8 +30,19 @@ class EventAdmin(admin.ModelAdmin):
     search_fields = ('name', 'description', 'group__name')
 
 
-@admin.register(GroupAvailability)
-class GroupAvailabilityAdmin(admin.ModelAdmin):
-    list_display = ('group', 'day_of_week', 'start_time', 'end_time', 'member_count')
-    list_filter = ('day_of_week', 'created_at')
+@admin.register(GroupAvailabilityState)
+class GroupAvailabilityStateAdmin(admin.ModelAdmin):
+    list_display = ('group', 'version', 'computed_version', 'generation', 'computed_at')
+    search_fields = ('group__name',)
+
+
+@admin.register(BusyProfile)
+class BusyProfileAdmin(admin.ModelAdmin):
+    list_display = ('user', 'updated_at')
+    search_fields = ('user__username',)
+
+
+@admin.register(RecomputeJob)
+class RecomputeJobAdmin(admin.ModelAdmin):
+    list_display = ('group', 'requested_at', 'claimed_at', 'claimed_by', 'attempts')
     search_fields = ('group__name',)
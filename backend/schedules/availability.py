@@ -0,0 +1,534 @@
+"""
+Keeping stored group free time in sync with members' busy times.
+"""
+
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from django.db import transaction
+from django.db.models import Case, F, PositiveSmallIntegerField, Q, When
+from django.utils import timezone
+
+from . import bitmap, zones
+from .profiles import load_busy_profiles, rebuild_busy_profiles
+from .singleflight import single_flight
+from .engine import DAYS_PER_WEEK, MINUTES_PER_DAY, minute_to_time
+from .models import Group, GroupAvailabilityState, GroupFreeInterval
+
+
+ALL_DAYS = (1 << DAYS_PER_WEEK) - 1
+
+
+def user_group_ids(user_ids):
+    """Ids of every group the given users created or belong to"""
+    return list(
+        Group.objects.filter(Q(creator__in=user_ids) | Q(members__in=user_ids))
+        .values_list('id', flat=True)
+        .distinct()
+    )
+
+
+def days_mask(days):
+    """Bitmask of the given days of the week; None means every day"""
+    if days is None:
+        return ALL_DAYS
+    mask = 0
+    for day_of_week in days:
+        mask |= 1 << day_of_week
+    return mask
+
+
+def mask_days(mask):
+    """Days of the week set in a bitmask"""
+    return [day_of_week for day_of_week in range(DAYS_PER_WEEK) if mask >> day_of_week & 1]
+
+
+def mark_groups_stale(group_ids, days=None):
+    """Bump the availability version of the given groups and flag the affected days"""
+    GroupAvailabilityState.objects.filter(group_id__in=group_ids).update(
+        version=F('version') + 1,
+        stale_days=F('stale_days').bitor(days_mask(days))
+    )
+
+
+_deferred = threading.local()
+
+
+def mark_user_groups_stale(user_ids, days=None):
+    """
+    Called whenever the given users' busy times change: rebuilds their stored
+    busy profiles and bumps the availability version of every group they are
+    part of. Call it inside the transaction that changed the
+    rows so the profiles stay in sync with them.
+    """
+    pending = getattr(_deferred, 'pending', None)
+    if pending is not None:
+        for user_id in user_ids:
+            pending[user_id] = pending.get(user_id, 0) | days_mask(days)
+        return
+    rebuild_busy_profiles(user_ids)
+    mark_groups_stale(user_group_ids(user_ids), days)
+
+
+@contextmanager
+def deferred_invalidation():
+    """
+    Collect stale marks raised inside the block (e.g. by per-row BusyTime
+    signals during a bulk delete) and apply them once on exit. If the block
+    raises, the marks are dropped along with the changes that raised them.
+    """
+    if getattr(_deferred, 'pending', None) is not None:
+        yield
+        return
+    _deferred.pending = {}
+    try:
+        yield
+    except BaseException:
+        _deferred.pending = None
+        raise
+    pending, _deferred.pending = _deferred.pending, None
+    if pending:
+        rebuild_busy_profiles(pending)
+    users_by_mask = defaultdict(list)
+    for user_id, mask in pending.items():
+        users_by_mask[mask].append(user_id)
+    for mask, user_ids in users_by_mask.items():
+        mark_groups_stale(user_group_ids(user_ids), mask_days(mask))
+
+
+def utc_profiles(user_ids, offsets=None):
+    """Stored weekly busy profiles of the given users rotated from their own zones into UTC"""
+    offsets = zones.user_offsets(user_ids) if offsets is None else offsets
+    return {
+        user_id: zones.rotate_profile(profile, -offsets[user_id])
+        for user_id, profile in load_busy_profiles(user_ids).items()
+    }
+
+
+def visible_user_ids(user_id):
+    """The user plus everyone who shares a group with them, as creator or member"""
+    group_ids = user_group_ids([user_id])
+    visible = set(Group.members.through.objects.filter(group_id__in=group_ids).values_list('user_id', flat=True))
+    visible.update(Group.objects.filter(id__in=group_ids).values_list('creator_id', flat=True))
+    visible.add(user_id)
+    return visible
+
+
+def common_free_time(user_ids, slot_minutes, per_slot=False, offset=0):
+    """
+    Free time shared by an arbitrary set of users, computed in memory from their
+    stored profiles. Nothing is stored; rows are GroupFreeInterval instances
+    without a group, in the same shape as expand_group_availability,
+    in the zone `offset` minutes from UTC.
+    """
+    offsets = zones.user_offsets(user_ids)
+    profiles = utc_profiles(user_ids, offsets)
+    count_minutes = zones.grid_minutes(slot_minutes, [*offsets.values(), offset])
+    busy = 0
+    for user_id in user_ids:
+        busy |= bitmap.busy_slots_mask(profiles[user_id], count_minutes)
+    free_mask = ~busy & ((1 << bitmap.week_slots(count_minutes)) - 1)
+    free_mask = zone_free_mask(free_mask, count_minutes, slot_minutes, offset)
+    expand = bitmap.mask_to_slots if per_slot else bitmap.mask_to_intervals
+    return [
+        GroupFreeInterval(
+            day_of_week=day_of_week,
+            start_time=minute_to_time(start),
+            end_time=minute_to_time(end),
+            member_count=len(user_ids)
+        )
+        for day_of_week, start, end in expand(free_mask, slot_minutes)
+    ]
+
+
+def availability_is_stale(group):
+    """A group without state has never been computed and is always stale"""
+    if Group.availability_state.is_cached(group):
+        state = getattr(group, 'availability_state', None)
+    else:
+        state = GroupAvailabilityState.objects.filter(group=group).first()
+    return state is None or state.is_stale or zones.offsets_changed(state.zone_offsets)
+
+
+def group_member_map(groups):
+    """{group_id: member ids, creator included} for several groups with one query"""
+    members = {group.id: [] for group in groups}
+    memberships = Group.members.through.objects.filter(group_id__in=members).values_list('group_id', 'user_id')
+    for group_id, user_id in memberships:
+        members[group_id].append(user_id)
+    for group in groups:
+        if group.creator_id not in members[group.id]:
+            members[group.id].append(group.creator_id)
+    return members
+
+
+def member_busy_slots(profile, slot_minutes, days=None):
+    """A member's busy slots as a 0/1 vector over the week, or over just `days` with the rest left at zero"""
+    if days is not None:
+        profile = [intervals if day_of_week in days else [] for day_of_week, intervals in enumerate(profile)]
+    return bitmap.mask_to_array(bitmap.busy_slots_mask(profile, slot_minutes), slot_minutes).astype(np.int32)
+
+
+def load_group_zones(groups):
+    """
+    Members and zones of several groups. Returns (members, offsets, group_zones):
+    member ids per group, {user_id: offset} for all of them, and
+    {group_id: (zone offsets, count minutes)}, where zone offsets are
+    {zone name: offset} for the group's members outside UTC and count minutes is
+    the grid_minutes of the group's slot size and those offsets.
+    """
+    members = group_member_map(groups)
+    user_ids = set().union(*members.values())
+    names = zones.user_zone_names(user_ids)
+    offsets = zones.user_offsets(user_ids, names)
+    group_zones = {}
+    for group in groups:
+        zone_offsets = {names[user_id]: offsets[user_id] for user_id in members[group.id] if user_id in names}
+        group_zones[group.id] = (zone_offsets, zones.grid_minutes(group.slot_minutes, zone_offsets.values()))
+    return members, offsets, group_zones
+
+
+def count_busy_members(members, offsets, group_zones, group_days=None):
+    """
+    Count busy members per slot, at each group's count minutes, from shared member
+    profiles; the arguments are as returned by load_group_zones. `group_days`
+    ({group_id: tuple of UTC days, or None for the whole week}) limits the work for
+    a group to those days, leaving the slots of its other days at zero.
+    """
+    profiles = utc_profiles(set().union(*members.values()), offsets)
+    member_slots = {}
+    counts = {}
+    for group_id, member_ids in members.items():
+        count_minutes = group_zones[group_id][1]
+        days = group_days.get(group_id) if group_days is not None else None
+        group_counts = np.zeros(bitmap.week_slots(count_minutes), dtype=np.int32)
+        for user_id in member_ids:
+            key = (user_id, count_minutes, days)
+            if key not in member_slots:
+                member_slots[key] = member_busy_slots(profiles[user_id], count_minutes, days)
+            group_counts += member_slots[key]
+        counts[group_id] = group_counts
+    return counts
+
+
+def build_groups_busy_counts(groups):
+    """
+    Count busy members per slot for several groups over the whole week.
+    Returns {group_id: (busy counts, member count, zone offsets, count minutes)};
+    see load_group_zones.
+    """
+    members, offsets, group_zones = load_group_zones(groups)
+    counts = count_busy_members(members, offsets, group_zones)
+    return {group.id: (counts[group.id], len(members[group.id]), *group_zones[group.id]) for group in groups}
+
+
+def has_counts(state):
+    """Whether a state holds busy counts; ones computed before they existed don't"""
+    return bitmap.unpack_counts(state.busy_counts, state.count_minutes) is not None
+
+
+def is_current(state, group):
+    """Whether a group's stored result is complete and up to date"""
+    return (
+        not state.is_stale and not state.stale_days
+        and state.slot_minutes == group.slot_minutes and has_counts(state)
+        and not zones.offsets_changed(state.zone_offsets)
+    )
+
+
+def recompute_groups(groups, days=None, force=False):
+    """
+    Recompute free time for several groups at once.
+    The stored busy profiles of the union of their members are loaded with one
+    query, one small value per member, however many of the groups they are in.
+    Each group's week is stored as per-slot busy counts plus one packed bitmap of
+    the slots where the count is zero, and all of them are written with a single UPDATE.
+
+    Passing `days` limits the work to those days plus any days already flagged
+    stale for a group; only their slots are counted again and the other days of
+    the stored counts are kept. An empty
+    `days` recomputes exactly the days flagged stale.
+
+    The work runs in one transaction holding a write lock on the groups' state
+    rows, so concurrent recomputes of a group wait for each other instead of
+    interleaving, and groups that are already current once the lock is acquired
+    are skipped unless `force` is set. Every published result bumps the state's `generation`.
+    """
+    groups = list(groups)
+    if not groups:
+        return
+    group_ids = sorted(group.id for group in groups)
+
+    with transaction.atomic():
+        # On SQLite, the database this project runs on, select_for_update() is a
+        # no-op. The lock comes from this INSERT OR IGNORE instead: any write,
+        # even one that inserts nothing, takes the database's write lock until
+        # the transaction ends, so a second recompute blocks here until the
+        # first commits and then reads its results. Keep a write first in this block.
+        GroupAvailabilityState.objects.bulk_create(
+            [GroupAvailabilityState(group_id=group_id) for group_id in group_ids], ignore_conflicts=True
+        )
+        # On databases with row locks, rows are locked in id order so overlapping
+        # batches can't deadlock. Anything that bumps a version after this point
+        # leaves that group stale.
+        locked = GroupAvailabilityState.objects.select_for_update().filter(group_id__in=group_ids)
+        states = {state.group_id: state for state in locked.order_by('group_id')}
+        if not force:
+            groups = [group for group in groups if not is_current(states[group.id], group)]
+        if groups:
+            _recompute_locked(groups, states, days)
+
+
+def _recompute_locked(groups, states, days):
+    """Rebuild and publish the given groups; their `states` rows must be locked"""
+    requested = days_mask(days)
+    members, offsets, group_zones = load_group_zones(groups)
+    masks = {}
+    stored_counts = {}
+    for group in groups:
+        state = states[group.id]
+        zone_offsets, count_minutes = group_zones[group.id]
+        stored_counts[group.id] = (
+            bitmap.unpack_counts(state.busy_counts, count_minutes)
+            if state.slot_minutes == group.slot_minutes and state.count_minutes == count_minutes else None
+        )
+        # Counts stored at another resolution (or not at all), or rotated by offsets
+        # that have since changed, cannot be spliced
+        if (
+            stored_counts[group.id] is None
+            or (state.is_stale and not state.stale_days)
+            or zones.offsets_changed(state.zone_offsets, zone_offsets)
+        ):
+            masks[group.id] = ALL_DAYS
+        else:
+            masks[group.id] = requested | state.stale_days
+    # Flagged days are the local days of whoever changed them; in a group with
+    # members outside UTC they also reach into the neighbouring UTC days
+    group_days = {
+        group_id: tuple(zones.utc_days(mask_days(mask), group_zones[group_id][0].values())) if mask != ALL_DAYS else None
+        for group_id, mask in masks.items()
+    }
+    busy_counts = count_busy_members(members, offsets, group_zones, group_days)
+
+    now = timezone.now()
+    for group in groups:
+        state = states[group.id]
+        counts = busy_counts[group.id]
+        zone_offsets, count_minutes = group_zones[group.id]
+        if group_days[group.id] is not None:
+            recomputed = bitmap.mask_to_array(
+                bitmap.days_slot_mask(group_days[group.id], count_minutes), count_minutes
+            )
+            counts = np.where(recomputed, counts, stored_counts[group.id])
+        state.busy_counts = bitmap.pack_counts(counts)
+        state.free_slots = bitmap.pack(bitmap.array_to_mask(counts == 0), count_minutes)
+        state.slot_minutes = group.slot_minutes
+        state.count_minutes = count_minutes
+        state.member_count = len(members[group.id])
+        state.zone_offsets = zone_offsets
+        state.computed_version = state.version
+        # A bump after `states` was read may have flagged days this pass already
+        # covered, so only clear the flags if the version is still the one we read
+        state.stale_days = Case(
+            When(version=state.version, then=F('stale_days').bitand(ALL_DAYS ^ masks[group.id])),
+            default=F('stale_days'),
+            output_field=PositiveSmallIntegerField()
+        )
+        state.computed_at = now
+        state.generation = F('generation') + 1
+
+    GroupAvailabilityState.objects.bulk_update(
+        [states[group.id] for group in groups],
+        [
+            'busy_counts', 'free_slots', 'slot_minutes', 'count_minutes', 'member_count', 'zone_offsets',
+            'computed_version', 'stale_days', 'computed_at', 'generation'
+        ]
+    )
+
+
+def update_membership(group, user, joined):
+    """
+    Add `user` to or remove them from `group` and apply the change to the stored
+    busy counts by adding or subtracting that one member's weekly profile, which
+    costs one query and O(slots) work however large the group is.
+
+    Returns False when the counts could not be updated in place (missing, stale,
+    at another slot size, too coarse for the user's zone, or changed concurrently);
+    the group is then left stale and the caller should schedule a full recompute.
+    """
+    before = GroupAvailabilityState.objects.filter(group=group).first()
+    if joined:
+        group.members.add(user)
+    else:
+        group.members.remove(user)
+
+    if (
+        before is None or before.is_stale or before.stale_days or before.slot_minutes != group.slot_minutes
+        or zones.offsets_changed(before.zone_offsets)
+    ):
+        return False
+    counts = bitmap.unpack_counts(before.busy_counts, before.count_minutes)
+    if counts is None:
+        return False
+
+    member_count = before.member_count
+    zone_offsets = dict(before.zone_offsets)
+    # The creator is always counted, whether or not they are in `members`
+    if user.id != group.creator_id:
+        names = zones.user_zone_names([user.id])
+        offsets = zones.user_offsets([user.id], names)
+        if offsets[user.id] % before.count_minutes:
+            return False
+        if joined and names:
+            zone_offsets[names[user.id]] = offsets[user.id]
+        profile = utc_profiles([user.id], offsets)[user.id]
+        delta = member_busy_slots(profile, before.count_minutes)
+        if joined:
+            counts += delta
+            member_count += 1
+        else:
+            counts -= delta
+            member_count -= 1
+            if (counts < 0).any():
+                return False
+
+    # Only succeeds if the membership change above was the sole bump since `before`
+    return bool(
+        GroupAvailabilityState.objects.filter(pk=before.pk, version=before.version + 1).update(
+            busy_counts=bitmap.pack_counts(counts),
+            free_slots=bitmap.pack(bitmap.array_to_mask(counts == 0), before.count_minutes),
+            member_count=member_count,
+            zone_offsets=zone_offsets,
+            computed_version=before.version + 1,
+            stale_days=0,
+            computed_at=timezone.now(),
+            generation=F('generation') + 1
+        )
+    )
+
+
+def zone_free_mask(mask, count_minutes, slot_minutes, offset):
+    """
+    A UTC free mask at `count_minutes` as a mask of `slot_minutes` slots in the
+    zone `offset` minutes from UTC; a slot is free only if all of it is
+    """
+    flags = zones.rotate_slots(bitmap.mask_to_array(mask, count_minutes), count_minutes, offset)
+    return bitmap.array_to_mask(bitmap.coarsen(flags, count_minutes, slot_minutes))
+
+
+def stored_free_mask(state, offset=0):
+    """A group's stored free slots in the zone `offset` minutes from UTC, at its slot size"""
+    return zone_free_mask(bitmap.unpack(state.free_slots), state.count_minutes, state.slot_minutes, offset)
+
+
+def expand_group_availability(state, per_slot=False, offset=0):
+    """
+    Expand a group's stored bitmap into GroupFreeInterval rows so clients
+    keep receiving the same shape: one row per free interval, or one row per
+    free slot when `per_slot` is set. Times are in the zone `offset` minutes from UTC.
+    """
+    free_mask = stored_free_mask(state, offset)
+    expand = bitmap.mask_to_slots if per_slot else bitmap.mask_to_intervals
+    return [
+        GroupFreeInterval(
+            group_id=state.group_id,
+            day_of_week=day_of_week,
+            start_time=minute_to_time(start),
+            end_time=minute_to_time(end),
+            member_count=state.member_count,
+            created_at=state.computed_at
+        )
+        for day_of_week, start, end in expand(free_mask, state.slot_minutes)
+    ]
+
+
+def refresh_group_availability(group, wait=True):
+    """
+    Bring a group's stored result up to date and return its state.
+    Concurrent callers for the same group, in this process or other worker
+    processes on the host, share one recompute: the first one computes and the
+    rest wait, then find the group current and skip the work. With wait=False a
+    caller that finds a recompute in flight gets the previous state instead,
+    unless there is none yet or it has no busy counts to serve.
+    """
+    with single_flight(f'group-availability-{group.id}', blocking=wait) as computing:
+        if computing:
+            recompute_groups([group], days=())
+    state = GroupAvailabilityState.objects.filter(group=group).first()
+    if state is None or not has_counts(state):
+        return refresh_group_availability(group)
+    return state
+
+
+def free_counts(state, offset=0):
+    """
+    How many members are free in each slot of the week, at the group's slot size, in
+    the zone `offset` minutes from UTC. The state must have busy counts; see
+    refresh_group_availability.
+    """
+    busy_counts = bitmap.unpack_counts(state.busy_counts, state.count_minutes)
+    if busy_counts is None:
+        raise ValueError(f'Group {state.group_id} has no busy counts yet')
+    counts = zones.rotate_slots(state.member_count - busy_counts, state.count_minutes, offset)
+    return bitmap.coarsen(counts, state.count_minutes, state.slot_minutes)
+
+
+def quorum_slots(state, min_free, offset=0):
+    """Yield (day_of_week, start_minute, end_minute, free count) for slots where at least `min_free` members are free"""
+    counts = free_counts(state, offset)
+    per_day = bitmap.slots_per_day(state.slot_minutes)
+    for index in np.flatnonzero(counts >= min_free).tolist():
+        day_of_week, slot = divmod(index, per_day)
+        start = slot * state.slot_minutes
+        yield day_of_week, start, start + state.slot_minutes, int(counts[index])
+
+
+def rank_windows(state, duration, days=None, start=0, end=MINUTES_PER_DAY, min_attendance=1, limit=5, offset=0):
+    """
+    Find the best windows of `duration` minutes within [start, end) on the given days.
+    A window's attendance is the fewest members free in any of its slots, found with
+    one sliding minimum over the free counts, so the cost doesn't depend on group size.
+    Windows are ranked by attendance, then earliest start; one overlapping a better
+    ranked window is skipped. Returns [(day_of_week, start_minute, end_minute, attendance)],
+    with days and times in the zone `offset` minutes from UTC.
+    """
+    slot_minutes = state.slot_minutes
+    width = -(-duration // slot_minutes)
+    first, last = -(-start // slot_minutes), end // slot_minutes
+    if last - first < width:
+        return []
+
+    day_list = np.array(sorted(set(days)) if days is not None else range(DAYS_PER_WEEK), dtype=np.intp)
+    counts = free_counts(state, offset).reshape(DAYS_PER_WEEK, -1)[day_list, first:last]
+    attendance = sliding_window_view(counts, width, axis=1).min(axis=2)
+    rows, positions = np.nonzero(attendance >= min_attendance)
+    scores = attendance[rows, positions]
+    # lexsort sorts by its last key first
+    order = np.lexsort((positions, day_list[rows], -scores))
+
+    windows = []
+    taken = defaultdict(list)
+    for index in order.tolist():
+        day_of_week = int(day_list[rows[index]])
+        first_slot = first + int(positions[index])
+        if any(first_slot < end_slot and start_slot < first_slot + width for start_slot, end_slot in taken[day_of_week]):
+            continue
+        taken[day_of_week].append((first_slot, first_slot + width))
+        window_start = first_slot * slot_minutes
+        windows.append((day_of_week, window_start, window_start + duration, int(scores[index])))
+        if len(windows) == limit:
+            break
+    return windows
+
+
+def calculate_group_free_time(group, days=None, force=False):
+    """
+    Calculate common FREE time slots for a group based on when NO ONE is busy.
+    This is the inverse of availability - we find times when nobody has marked themselves as busy.
+    The result is stored as one packed bitmap per group; see expand_group_availability.
+    `days` and `force` work as for recompute_groups.
+    """
+    recompute_groups([group], days, force)
@@ -0,0 +1,6 @@
+"""
+Synthetic data and repeatable timings for the scheduling core.
+
+Seed data with `manage.py seed_benchmark_data` and time it with
+`manage.py run_benchmarks`, which saves results as JSON for comparison.
+"""
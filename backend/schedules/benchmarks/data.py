@@ -0,0 +1,106 @@
+"""
+Synthetic users, groups and busy times for benchmarks.
+
+Busy times are written one row per 30-minute cell, the way the grid on the
+BusyTimes page produces them, so the engine sees realistically fragmented input.
+"""
+
+import random
+
+from django.contrib.auth.models import User
+
+from authentication.models import UserProfile
+
+from ..engine import DAYS_PER_WEEK, SLOT_MINUTES, SLOTS_PER_DAY, minute_to_time
+from ..models import BusyTime, Group
+from ..profiles import rebuild_busy_profiles
+
+
+USER_PREFIX = 'bench_user_'
+GROUP_PREFIX = 'bench-group-'
+
+
+def bench_users():
+    return User.objects.filter(username__startswith=USER_PREFIX)
+
+
+def bench_groups():
+    return Group.objects.filter(name__startswith=GROUP_PREFIX)
+
+
+def clear_bench_data():
+    """Remove everything created by seed(); busy times and groups cascade"""
+    bench_groups().delete()
+    bench_users().delete()
+
+
+def busy_cells(rng, fragmentation=0.15):
+    """
+    Pick the busy 30-minute cells of one synthetic week as (day_of_week, slot) pairs.
+    Weekdays get a working block plus meetings; `fragmentation` is the chance of
+    punching a free hole into any busy cell.
+    """
+    cells = set()
+    for day_of_week in range(DAYS_PER_WEEK):
+        if day_of_week < 5:
+            start = rng.randint(14, 20)  # 07:00 - 10:00
+            cells.update((day_of_week, slot) for slot in range(start, start + rng.randint(12, 18)))
+        for _ in range(rng.randint(0, 4)):
+            start = rng.randrange(SLOTS_PER_DAY)
+            cells.update((day_of_week, slot) for slot in range(start, min(start + rng.randint(1, 4), SLOTS_PER_DAY)))
+    return sorted(cell for cell in cells if rng.random() >= fragmentation)
+
+
+def cell_rows(user, cells):
+    return [
+        BusyTime(
+            user=user,
+            day_of_week=day_of_week,
+            start_time=minute_to_time(slot * SLOT_MINUTES),
+            end_time=minute_to_time((slot + 1) * SLOT_MINUTES)
+        )
+        for day_of_week, slot in cells
+    ]
+
+
+def seed(users=200, groups=50, group_size=8, overlap=0.3, fragmentation=0.15, seed=0):
+    """
+    Create `users` users with busy weeks and `groups` groups of `group_size` members.
+    `overlap` is the share of each group drawn from a small pool of popular users,
+    so higher values mean more members shared between groups.
+    Returns a summary of what was created.
+    """
+    rng = random.Random(seed)
+
+    User.objects.bulk_create([User(username=f'{USER_PREFIX}{i}') for i in range(users)])
+    created_users = list(bench_users().order_by('id'))
+    # bulk_create skips the signals that give real users their profiles
+    UserProfile.objects.bulk_create([UserProfile(user=user) for user in created_users])
+
+    busy_times = []
+    for user in created_users:
+        busy_times.extend(cell_rows(user, busy_cells(rng, fragmentation)))
+    BusyTime.objects.bulk_create(busy_times, batch_size=2000)
+    rebuild_busy_profiles([user.id for user in created_users])
+
+    popular = created_users[:max(1, len(created_users) // 10)]
+    created_groups = []
+    for i in range(groups):
+        shared = min(round(group_size * overlap), len(popular))
+        members = set(rng.sample(popular, shared))
+        while len(members) < min(group_size, len(created_users)):
+            members.add(rng.choice(created_users))
+        members = sorted(members, key=lambda user: user.id)
+        group = Group.objects.create(name=f'{GROUP_PREFIX}{i}', creator=members[0])
+        group.members.add(*members[1:])
+        created_groups.append(group)
+
+    return {
+        'users': len(created_users),
+        'groups': len(created_groups),
+        'busy_times': len(busy_times),
+        'group_size': group_size,
+        'overlap': overlap,
+        'fragmentation': fragmentation,
+        'seed': seed,
+    }
@@ -0,0 +1,94 @@
+"""
+Timing runs for the scheduling engines and the main API endpoints.
+"""
+
+import random
+import statistics
+import time
+
+from django.test import override_settings
+from rest_framework.test import APIClient
+
+from ..availability import calculate_group_free_time, recompute_groups
+from ..models import BusyTime
+from .data import bench_groups, busy_cells, cell_rows
+
+
+def measure(function, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - started)
+    return {
+        'runs': repeat,
+        'min': min(timings),
+        'median': statistics.median(timings),
+        'mean': statistics.fmean(timings),
+        'max': max(timings),
+    }
+
+
+def week_payload(rng):
+    return [
+        {
+            'day_of_week': row.day_of_week,
+            'start_time': row.start_time.strftime('%H:%M'),
+            'end_time': row.end_time.strftime('%H:%M'),
+        }
+        for row in cell_rows(None, busy_cells(rng))
+    ]
+
+
+def engine_benchmarks(groups, repeat):
+    group = groups[0]
+    return {
+        'calculate_group_free_time': measure(lambda: calculate_group_free_time(group, force=True), repeat),
+        'recompute_groups.all': measure(lambda: recompute_groups(groups, force=True), repeat),
+    }
+
+
+def endpoint_benchmarks(groups, repeat, rng):
+    group = groups[0]
+    user = group.creator
+    client = APIClient()
+    client.force_authenticate(user)
+    weeks = [week_payload(rng), week_payload(rng)]
+    original = list(BusyTime.objects.filter(user=user).values('day_of_week', 'start_time', 'end_time'))
+
+    def replace_week():
+        # Alternate between two weeks so every call has a real diff to apply
+        weeks.reverse()
+        client.put('/api/busy-times/week/', {'busy_times': weeks[0]}, format='json')
+
+    def batch_create():
+        client.delete('/api/busy-times/clear_all/')
+        client.post('/api/busy-times/batch_create/', {'busy_times': weeks[0]}, format='json')
+
+    with override_settings(ALLOWED_HOSTS=['*'], RECOMPUTE_IN_BACKGROUND=False):
+        results = {
+            'GET groups/': measure(lambda: client.get('/api/groups/'), repeat),
+            'GET groups/{id}/availability/': measure(
+                lambda: client.get(f'/api/groups/{group.id}/availability/'), repeat
+            ),
+            'PUT busy-times/week/': measure(replace_week, repeat),
+            'POST busy-times/batch_create/': measure(batch_create, repeat),
+        }
+        # Leave the seeded week as it was
+        client.put('/api/busy-times/week/', {'busy_times': [
+            {key: value.strftime('%H:%M') if key != 'day_of_week' else value for key, value in row.items()}
+            for row in original
+        ]}, format='json')
+    return results
+
+
+def run(repeat=5, include_endpoints=True, seed=0):
+    """Run every benchmark against the seeded groups and return {name: timing summary}"""
+    rng = random.Random(seed)
+    groups = list(bench_groups().order_by('id'))
+    if not groups:
+        raise ValueError('No benchmark data found; run seed_benchmark_data first')
+    results = engine_benchmarks(groups, repeat)
+    if include_endpoints:
+        results.update(endpoint_benchmarks(groups, repeat, rng))
+    return results
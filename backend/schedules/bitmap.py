@@ -0,0 +1,113 @@
+"""
+Packed weekly slot bitmaps.
+
+Bit ``i`` stands for slot ``i`` of the week at a given slot size, counting
+from Monday 00:00. Masks are plain Python ints while being worked on and
+are stored as little-endian bytes.
+
+Busy counts (how many members are busy in each slot) are kept alongside
+as NumPy vectors and stored as little-endian uint16 bytes.
+"""
+
+import numpy as np
+
+from .engine import DAYS_PER_WEEK, MINUTES_PER_DAY
+
+
+def slots_per_day(slot_minutes):
+    return MINUTES_PER_DAY // slot_minutes
+
+
+def week_slots(slot_minutes):
+    return slots_per_day(slot_minutes) * DAYS_PER_WEEK
+
+
+def days_slot_mask(days, slot_minutes):
+    """Mask covering every slot of the given days"""
+    per_day = slots_per_day(slot_minutes)
+    day_bits = (1 << per_day) - 1
+    mask = 0
+    for day_of_week in days:
+        mask |= day_bits << (day_of_week * per_day)
+    return mask
+
+
+def busy_slots_mask(day_intervals, slot_minutes):
+    """Mask of every slot overlapped by a weekly profile ([busy (start, end) intervals per day])"""
+    per_day = slots_per_day(slot_minutes)
+    mask = 0
+    for day_of_week, intervals in enumerate(day_intervals):
+        for start, end in intervals:
+            first = day_of_week * per_day + start // slot_minutes
+            last = day_of_week * per_day + -(-end // slot_minutes)
+            if first < last:
+                mask |= ((1 << (last - first)) - 1) << first
+    return mask
+
+
+def mask_to_intervals(mask, slot_minutes):
+    """Yield (day_of_week, start_minute, end_minute) for each run of set bits, split at midnight"""
+    per_day = slots_per_day(slot_minutes)
+    while mask:
+        start = (mask & -mask).bit_length() - 1
+        shifted = mask >> start
+        length = (shifted ^ (shifted + 1)).bit_length() - 1
+        end = start + length
+        mask &= ~(((1 << length) - 1) << start)
+        while start < end:
+            day_of_week = start // per_day
+            stop = min(end, (day_of_week + 1) * per_day)
+            yield (
+                day_of_week,
+                (start - day_of_week * per_day) * slot_minutes,
+                (stop - day_of_week * per_day) * slot_minutes
+            )
+            start = stop
+
+
+def mask_to_slots(mask, slot_minutes):
+    """Yield (day_of_week, start_minute, end_minute) for every set bit"""
+    for day_of_week, start, end in mask_to_intervals(mask, slot_minutes):
+        for slot_start in range(start, end, slot_minutes):
+            yield day_of_week, slot_start, slot_start + slot_minutes
+
+
+def pack(mask, slot_minutes):
+    return mask.to_bytes((week_slots(slot_minutes) + 7) // 8, 'little')
+
+
+def unpack(data):
+    return int.from_bytes(bytes(data), 'little')
+
+
+def mask_to_array(mask, slot_minutes):
+    """Boolean vector with one entry per slot of the week"""
+    raw = np.frombuffer(pack(mask, slot_minutes), dtype=np.uint8)
+    return np.unpackbits(raw, bitorder='little')[:week_slots(slot_minutes)].astype(bool)
+
+
+def array_to_mask(flags):
+    return unpack(np.packbits(flags, bitorder='little').tobytes())
+
+
+def coarsen(values, from_minutes, to_minutes):
+    """
+    Combine a per-slot vector at `from_minutes` into slots of `to_minutes`, a
+    multiple of it, keeping the smallest value of each: a slot is only free
+    for the members free during all of it
+    """
+    if from_minutes == to_minutes:
+        return values
+    return values.reshape(-1, to_minutes // from_minutes).min(axis=1)
+
+
+def pack_counts(counts):
+    return np.asarray(counts, dtype='<u2').tobytes()
+
+
+def unpack_counts(data, slot_minutes):
+    """Busy counts as an int32 vector, or None when nothing usable is stored"""
+    counts = np.frombuffer(bytes(data), dtype='<u2')
+    if counts.size != week_slots(slot_minutes):
+        return None
+    return counts.astype(np.int32)
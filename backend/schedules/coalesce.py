@@ -0,0 +1,191 @@
+"""
+Coalescing a user's BusyTime rows into maximal blocks.
+
+The grid saves one row per selection, so 09:00-09:30 and 09:30-10:00 end up
+as separate rows and overlapping selections pile up. With BUSY_TIME_COALESCE
+enabled the touched days are merged on every write, keeping one row per real
+busy block. Merging never changes a user's busy profile, and rows can still be
+split back into grid cells for clients that expect them.
+
+A row split into several cells cannot lend its id to each of them, or deleting
+one cell would delete the whole block. Those cells get negative ids encoding
+their day and minutes instead, and deleting or updating one changes just that cell.
+"""
+
+from collections import defaultdict
+
+from .engine import MINUTES_PER_DAY, end_minute, minute_to_time, start_minute
+from .models import BusyTime
+from .sweep import merge_intervals
+
+
+# Cell minutes run from 0 to 24:00 inclusive
+CELL_ID_BASE = MINUTES_PER_DAY + 1
+
+# The grid cell older clients draw, used for listings when rows are coalesced
+DEFAULT_CELL_MINUTES = 30
+
+
+def plan_merge(rows):
+    """
+    Plan the merge of one user's rows for one day, given as (id, start, end) minutes.
+    Returns ({id: (start, end)} for the rows that grow, [ids to delete]); every
+    block of overlapping or touching rows keeps its lowest id.
+    """
+    blocks = []
+    for row_id, start, end in sorted(rows, key=lambda row: (row[1], row[2])):
+        if blocks and start <= blocks[-1][1]:
+            blocks[-1][1] = max(blocks[-1][1], end)
+            blocks[-1][2].append(row_id)
+        else:
+            blocks.append([start, end, [row_id]])
+
+    updates = {}
+    deletes = []
+    for start, end, row_ids in blocks:
+        if len(row_ids) > 1:
+            keep = min(row_ids)
+            updates[keep] = (start, end)
+            deletes.extend(row_id for row_id in row_ids if row_id != keep)
+    return updates, deletes
+
+
+def coalesce_busy_times(user_ids, days=None, dry_run=False):
+    """
+    Merge the given users' overlapping and touching rows on the given days.
+    Deleting the absorbed rows fires the BusyTime signals, so call it inside
+    deferred_invalidation(). Returns the number of rows removed, or that would
+    be for a dry run, which writes nothing.
+    """
+    rows = BusyTime.objects.filter(user_id__in=user_ids)
+    if days is not None:
+        rows = rows.filter(day_of_week__in=days)
+    by_day = defaultdict(list)
+    for row_id, user_id, day_of_week, start_time, end_time in rows.values_list(
+        'id', 'user_id', 'day_of_week', 'start_time', 'end_time'
+    ):
+        by_day[user_id, day_of_week].append((row_id, start_minute(start_time), end_minute(end_time)))
+
+    to_update = []
+    to_delete = []
+    for day_rows in by_day.values():
+        if len(day_rows) < 2:
+            continue
+        updates, deletes = plan_merge(day_rows)
+        to_update.extend(
+            BusyTime(id=row_id, start_time=minute_to_time(start), end_time=minute_to_time(end))
+            for row_id, (start, end) in updates.items()
+        )
+        to_delete.extend(deletes)
+
+    if dry_run:
+        return len(to_delete)
+    # Delete first: a kept row may grow into the exact times of a row it absorbs
+    if to_delete:
+        BusyTime.objects.filter(id__in=to_delete).delete()
+    if to_update:
+        BusyTime.objects.bulk_update(to_update, ['start_time', 'end_time'], batch_size=500)
+    return len(to_delete)
+
+
+def covering_busy_time(busy_time):
+    """The stored row that now holds `busy_time`'s interval after a merge"""
+    return BusyTime.objects.filter(
+        user_id=busy_time.user_id,
+        day_of_week=busy_time.day_of_week,
+        start_time__lte=busy_time.start_time,
+        end_time__gte=busy_time.end_time
+    ).order_by('id').first() or busy_time
+
+
+def merge_keys(keys):
+    """Merge (day_of_week, start_time, end_time) keys into one key per block"""
+    by_day = defaultdict(list)
+    for day_of_week, start_time, end_time in keys:
+        by_day[day_of_week].append((start_minute(start_time), end_minute(end_time)))
+    return [
+        (day_of_week, minute_to_time(start), minute_to_time(end))
+        for day_of_week in sorted(by_day)
+        for start, end in merge_intervals(by_day[day_of_week])
+    ]
+
+
+def cell_id(day_of_week, start, end):
+    """Id of a cell split from a longer row, encoding its day and (start, end) minutes"""
+    return -((day_of_week * CELL_ID_BASE + start) * CELL_ID_BASE + end)
+
+
+def parse_cell_id(value):
+    """(day_of_week, start, end) of an id made by cell_id, or None for any other id"""
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        return None
+    if value >= 0:
+        return None
+    rest, end = divmod(-value, CELL_ID_BASE)
+    day_of_week, start = divmod(rest, CELL_ID_BASE)
+    if day_of_week >= len(BusyTime.DAYS_OF_WEEK) or start >= end:
+        return None
+    return day_of_week, start, end
+
+
+def split_into_cells(busy_times, cell_minutes):
+    """
+    Split rows into grid cells of `cell_minutes`, aligned to midnight, for
+    clients that expect one row per cell. A row that is a single cell keeps
+    its id; cells of longer rows get cell ids.
+    """
+    cells = []
+    for busy_time in busy_times:
+        start = start_minute(busy_time.start_time)
+        end = end_minute(busy_time.end_time)
+        bounds = []
+        while start < end:
+            cell_end = min(end, (start // cell_minutes + 1) * cell_minutes)
+            bounds.append((start, cell_end))
+            start = cell_end
+        cells.extend(
+            BusyTime(
+                id=busy_time.id if len(bounds) == 1 else cell_id(busy_time.day_of_week, cell_start, cell_end),
+                user_id=busy_time.user_id,
+                day_of_week=busy_time.day_of_week,
+                start_time=minute_to_time(cell_start),
+                end_time=minute_to_time(cell_end),
+                created_at=busy_time.created_at
+            )
+            for cell_start, cell_end in bounds
+        )
+    return cells
+
+
+def free_interval(user_id, day_of_week, start, end):
+    """
+    Cut the (start, end) minutes out of the user's rows on one day, shrinking
+    or splitting the rows that overlap them; the rest keep their ids. Returns
+    whether anything changed. Fires the BusyTime signals, so call it inside
+    deferred_invalidation().
+    """
+    changed = False
+    rows = BusyTime.objects.filter(user_id=user_id, day_of_week=day_of_week).order_by('id')
+    for busy_time in rows:
+        row_start = start_minute(busy_time.start_time)
+        row_end = end_minute(busy_time.end_time)
+        if row_start >= end or row_end <= start:
+            continue
+        changed = True
+        pieces = [
+            (piece_start, piece_end)
+            for piece_start, piece_end in ((row_start, min(row_end, start)), (max(row_start, end), row_end))
+            if piece_start < piece_end
+        ]
+        if not pieces:
+            busy_time.delete()
+            continue
+        (busy_time.start_time, busy_time.end_time), *rest = [
+            (minute_to_time(piece_start), minute_to_time(piece_end)) for piece_start, piece_end in pieces
+        ]
+        busy_time.save(update_fields=['start_time', 'end_time'])
+        for start_time, end_time in rest:
+            BusyTime.objects.create(user_id=user_id, day_of_week=day_of_week, start_time=start_time, end_time=end_time)
+    return changed
@@ -0,0 +1,85 @@
+"""
+Free time over concrete dates.
+
+A group's weekly free time is expanded lazily, one date at a time, and the
+dated Events its members are committed to are subtracted from it. Each date
+reads the stored UTC week at the viewer's offset on that date, so dates after
+a daylight saving switch inside the range keep their wall-clock times. Events
+are converted to the viewer's wall clock and merged once, then each date
+bisects into them so it only visits the events that overlap it.
+"""
+
+from bisect import bisect_right
+from datetime import datetime, time, timedelta
+
+from . import bitmap
+from .availability import stored_free_mask, user_group_ids
+from .engine import DAYS_PER_WEEK, END_OF_DAY, MINUTES_PER_DAY, end_minute, start_minute
+from .models import Event
+from .sweep import merge_intervals
+from .zones import date_offset, get_zone
+
+
+def weekly_free_intervals(state, offset):
+    """The stored free week in the viewer's zone as [(start, end) intervals per day]"""
+    days = [[] for _ in range(DAYS_PER_WEEK)]
+    free_mask = stored_free_mask(state, offset)
+    for day_of_week, start, end in bitmap.mask_to_intervals(free_mask, state.slot_minutes):
+        days[day_of_week].append((start, end))
+    return days
+
+
+def member_event_intervals(member_ids, start_date, end_date, zone):
+    """
+    Merged (start, end) intervals, in minutes from `start_date` midnight on the
+    viewer's wall clock, of every event in any group the members belong to.
+    Each event is taken to be in its creator's time zone.
+    """
+    range_start = datetime.combine(start_date, time())
+    # A day either side so events shifted across midnight by the zone change are caught
+    events = Event.objects.filter(
+        group_id__in=user_group_ids(member_ids),
+        date__range=(start_date - timedelta(days=1), end_date + timedelta(days=1))
+    ).values_list('date', 'start_time', 'end_time', 'created_by__userprofile__timezone')
+
+    intervals = []
+    for event_date, start_time, end_time, event_zone in events:
+        starts_at = datetime.combine(event_date, time(), tzinfo=get_zone(event_zone or 'UTC'))
+        starts_at += timedelta(minutes=start_minute(start_time))
+        # 23:59 stands for the end of the day, as it does for busy times
+        length = (MINUTES_PER_DAY if end_time == END_OF_DAY else end_minute(end_time)) - start_minute(start_time)
+        if length <= 0:
+            continue
+        local_start = starts_at.astimezone(zone).replace(tzinfo=None)
+        start = int((local_start - range_start).total_seconds() // 60)
+        intervals.append((start, start + length))
+    return merge_intervals(intervals)
+
+
+def iter_free_dates(state, zone, busy, start_date, end_date):
+    """
+    Yield (date, start_minute, end_minute) for the stored weekly free intervals
+    of every date from `start_date` to `end_date` inclusive, in the viewer's
+    `zone` at that date's offset, minus the `busy` intervals.
+    """
+    weeks = {}
+    busy_ends = [end for _, end in busy]
+    for day_index in range((end_date - start_date).days + 1):
+        date = start_date + timedelta(days=day_index)
+        offset = date_offset(zone, date)
+        if offset not in weeks:
+            weeks[offset] = weekly_free_intervals(state, offset)
+        day_start = day_index * MINUTES_PER_DAY
+        first_busy = bisect_right(busy_ends, day_start)
+        for start, end in weeks[offset][date.weekday()]:
+            cursor = day_start + start
+            free_end = day_start + end
+            index = first_busy
+            while index < len(busy) and busy[index][0] < free_end:
+                busy_start, busy_end = busy[index]
+                if busy_start > cursor:
+                    yield date, cursor - day_start, busy_start - day_start
+                cursor = max(cursor, busy_end)
+                index += 1
+            if cursor < free_end:
+                yield date, cursor - day_start, free_end - day_start
@@ -0,0 +1,33 @@
+"""
+Week and time-of-day helpers shared by the scheduling modules.
+"""
+
+from datetime import time
+
+
+MINUTES_PER_DAY = 24 * 60
+SLOT_MINUTES = 30
+SLOTS_PER_DAY = MINUTES_PER_DAY // SLOT_MINUTES
+DAYS_PER_WEEK = 7
+
+# TimeField cannot hold 24:00, so the last slot of a day ends at 23:59 like
+# the busy blocks the frontend submits.
+END_OF_DAY = time(23, 59)
+
+
+def start_minute(value):
+    """Minutes since midnight, rounding partial minutes down"""
+    return value.hour * 60 + value.minute
+
+
+def end_minute(value):
+    """Minutes since midnight, rounding partial minutes up so a block never shrinks"""
+    return value.hour * 60 + value.minute + (1 if value.second or value.microsecond else 0)
+
+
+def minute_to_time(minute):
+    """Convert minutes since midnight to a time, clamping 24:00 to END_OF_DAY"""
+    if minute >= MINUTES_PER_DAY:
+        return END_OF_DAY
+    return time(minute // 60, minute % 60)
+
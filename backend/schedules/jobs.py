@@ -0,0 +1,122 @@
+"""
+DB-backed queue for recomputing group free time off the request path.
+
+Enqueueing a group that already has a job only refreshes its
+`requested_at`, so any number of edits to the same group between two
+worker polls results in a single recompute.
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .availability import availability_is_stale, recompute_groups
+from .models import Group, RecomputeJob
+
+
+MAX_ATTEMPTS = 5
+
+PENDING = 'pending'
+CURRENT = 'current'
+
+
+def enqueue_recompute(group_ids):
+    """Queue a recompute for each group, coalescing with jobs already queued"""
+    group_ids = set(group_ids)
+    if not group_ids:
+        return
+    now = timezone.now()
+    RecomputeJob.objects.filter(group_id__in=group_ids).update(requested_at=now)
+    RecomputeJob.objects.bulk_create(
+        [RecomputeJob(group_id=group_id, requested_at=now) for group_id in group_ids],
+        ignore_conflicts=True
+    )
+
+
+def schedule_recompute(group_ids, days=None):
+    """
+    Recompute the groups now, or queue them when background recompute is enabled.
+    `days` narrows an inline recompute. Queued jobs don't carry days: the worker
+    recomputes whatever days are flagged stale on each group's state, which
+    already includes every day changed since the last recompute.
+    """
+    if settings.RECOMPUTE_IN_BACKGROUND:
+        enqueue_recompute(group_ids)
+        return
+    recompute_groups(Group.objects.filter(id__in=set(group_ids)), days)
+
+
+def availability_status(group):
+    """
+    'pending' while a recompute is queued or the stored result is stale, else 'current'.
+    Uses the `has_recompute_job` annotation and a select_related state when the
+    queryset provides them (see GroupViewSet), so listing groups needs no extra queries.
+    """
+    has_job = getattr(group, 'has_recompute_job', None)
+    if has_job is None:
+        has_job = RecomputeJob.objects.filter(group=group).exists()
+    if has_job or availability_is_stale(group):
+        return PENDING
+    return CURRENT
+
+
+def _unclaimed(now, claim_timeout):
+    return Q(claimed_at__isnull=True) | Q(claimed_at__lt=now - timedelta(seconds=claim_timeout))
+
+
+def claim_jobs(worker_id, limit=10, settle_seconds=0, claim_timeout=300):
+    """
+    Claim up to `limit` jobs for this worker.
+    Jobs requested within the last `settle_seconds` are left alone so bursts
+    can keep coalescing; claims older than `claim_timeout` are considered abandoned.
+    """
+    now = timezone.now()
+    candidates = (
+        RecomputeJob.objects
+        .filter(requested_at__lte=now - timedelta(seconds=settle_seconds), attempts__lt=MAX_ATTEMPTS)
+        .filter(_unclaimed(now, claim_timeout))
+        .values_list('pk', 'claimed_at')[:limit]
+    )
+
+    claimed = []
+    for pk, previous_claim in candidates:
+        # Compare-and-set so two workers never claim the same job
+        updated = RecomputeJob.objects.filter(pk=pk, claimed_at=previous_claim).update(
+            claimed_at=now, claimed_by=worker_id, attempts=F('attempts') + 1
+        )
+        if updated:
+            claimed.append(pk)
+
+    return list(RecomputeJob.objects.filter(pk__in=claimed).select_related('group'))
+
+
+def run_jobs(jobs):
+    """Recompute the jobs' groups in one batch; returns False if the recompute failed"""
+    job_ids = [job.pk for job in jobs]
+    try:
+        recompute_groups([job.group for job in jobs], days=())
+    except Exception as e:
+        RecomputeJob.objects.filter(pk__in=job_ids).update(claimed_at=None, claimed_by='', last_error=str(e))
+        return False
+
+    for job in jobs:
+        # If the group was re-requested while we were computing, keep the job for another pass
+        deleted, _ = RecomputeJob.objects.filter(pk=job.pk, requested_at=job.requested_at).delete()
+        if not deleted:
+            RecomputeJob.objects.filter(pk=job.pk).update(claimed_at=None, claimed_by='', attempts=0)
+    return True
+
+
+def purge_failed_jobs(claim_timeout=300):
+    """
+    Delete the jobs that failed MAX_ATTEMPTS times, which would otherwise sit in
+    the queue forever. Their groups stay stale, so the next read or edit queues a
+    fresh job. Returns the deleted jobs' (group_id, last_error) for logging.
+    """
+    failed = RecomputeJob.objects.filter(attempts__gte=MAX_ATTEMPTS).filter(_unclaimed(timezone.now(), claim_timeout))
+    dead = list(failed.values_list('pk', 'group_id', 'last_error'))
+    if dead:
+        RecomputeJob.objects.filter(pk__in=[pk for pk, _, _ in dead]).delete()
+    return [(group_id, last_error) for _, group_id, last_error in dead]
@@ -0,0 +1,98 @@
+"""
+Translating between legacy availability and BusyTime rows.
+
+Availability stored when a user was free; BusyTime stores when they are not.
+A day's busy intervals are the gaps left by its available intervals, so a day
+with no availability at all is busy from start to end, and the other way
+round. The legacy /availabilities/ endpoint is served from these complements.
+"""
+
+from .availability import mark_user_groups_stale
+from .engine import DAYS_PER_WEEK, END_OF_DAY, MINUTES_PER_DAY, end_minute, minute_to_time, start_minute
+from .models import Availability, BusyTime
+from .profiles import load_busy_profiles
+from .sweep import free_intervals, merge_intervals
+
+
+def interval_minutes(start_time, end_time):
+    """(start, end) minutes of a stored interval; 23:59 stands for the end of the day"""
+    end = MINUTES_PER_DAY if end_time == END_OF_DAY else end_minute(end_time)
+    return start_minute(start_time), end
+
+
+def busy_complement(available):
+    """
+    Busy (day_of_week, start, end) intervals for a week of available intervals,
+    given as [(start, end) minutes per day] for Monday to Sunday.
+    """
+    return [
+        (day_of_week, start, end)
+        for day_of_week in range(DAYS_PER_WEEK)
+        for start, end in free_intervals(available[day_of_week])
+    ]
+
+
+def busy_times_for(user_id, available):
+    """Unsaved BusyTime rows covering everything outside the user's available intervals"""
+    return [
+        BusyTime(user_id=user_id, day_of_week=day_of_week, start_time=minute_to_time(start), end_time=minute_to_time(end))
+        for day_of_week, start, end in busy_complement(available)
+    ]
+
+
+def availability_id(day_of_week, start):
+    """Id of an available interval: the minute of the week it starts at"""
+    return day_of_week * MINUTES_PER_DAY + start
+
+
+def availability_rows(user_id):
+    """The user's availability as unsaved Availability rows, read from their busy profile"""
+    profile = load_busy_profiles([user_id])[user_id]
+    rows = []
+    for day_of_week, intervals in enumerate(profile):
+        # Profiles keep 23:59 as the last minute; here it is the end of the day
+        busy = [(start, MINUTES_PER_DAY if end == MINUTES_PER_DAY - 1 else end) for start, end in intervals]
+        rows.extend(
+            Availability(
+                id=availability_id(day_of_week, start),
+                user_id=user_id,
+                day_of_week=day_of_week,
+                start_time=minute_to_time(start),
+                end_time=minute_to_time(end)
+            )
+            for start, end in free_intervals(busy)
+        )
+    return rows
+
+
+def change_day(user_id, day_of_week, busy=(), free=()):
+    """
+    Mark the (start, end) intervals in `busy` as busy on one day, then those in
+    `free` as available. The day's rows are only rewritten, as merged blocks,
+    when its busy time actually changes; returns whether it did. Deleting the
+    old rows fires the BusyTime signals, so call it inside deferred_invalidation().
+    """
+    rows = BusyTime.objects.filter(user_id=user_id, day_of_week=day_of_week)
+    current = merge_intervals(
+        interval_minutes(start_time, end_time) for start_time, end_time in rows.values_list('start_time', 'end_time')
+    )
+    target = current + list(busy)
+    for free_start, free_end in free:
+        target = [
+            piece
+            for start, end in target
+            for piece in ((start, min(end, free_start)), (max(start, free_end), end))
+            if piece[0] < piece[1]
+        ]
+    target = merge_intervals(target)
+    if target == current:
+        return False
+
+    rows.delete()
+    BusyTime.objects.bulk_create([
+        BusyTime(user_id=user_id, day_of_week=day_of_week, start_time=minute_to_time(start), end_time=minute_to_time(end))
+        for start, end in target
+    ])
+    # bulk_create skips the signals
+    mark_user_groups_stale([user_id], [day_of_week])
+    return True
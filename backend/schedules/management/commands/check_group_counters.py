@@ -0,0 +1,56 @@
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from schedules import bitmap, zones
+from schedules.availability import build_groups_busy_counts, recompute_groups
+from schedules.models import Group, GroupAvailabilityState
+
+
+class Command(BaseCommand):
+    help = "Compare every current group's stored busy counts against a full recompute"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=200, help='Groups per chunk')
+        parser.add_argument('--repair', action='store_true', help='Fully recompute the groups that drifted')
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        group_ids = list(Group.objects.order_by('id').values_list('id', flat=True))
+
+        checked = 0
+        drifted = []
+        for offset in range(0, len(group_ids), chunk_size):
+            chunk = group_ids[offset:offset + chunk_size]
+            # Stale groups are due for a recompute anyway, so only current ones are checked
+            states = {
+                state.group_id: state
+                for state in GroupAvailabilityState.objects.filter(group_id__in=chunk)
+                if not state.is_stale and not state.stale_days
+            }
+            groups = list(Group.objects.filter(id__in=states))
+            expected = build_groups_busy_counts(groups)
+            for group in groups:
+                state = states[group.id]
+                counts, member_count, zone_offsets, count_minutes = expected[group.id]
+                stored = bitmap.unpack_counts(state.busy_counts, state.count_minutes)
+                consistent = (
+                    stored is not None
+                    and state.slot_minutes == group.slot_minutes
+                    and state.count_minutes == count_minutes
+                    and state.member_count == member_count
+                    and not zones.offsets_changed(state.zone_offsets, zone_offsets)
+                    and np.array_equal(stored, counts)
+                    and bitmap.unpack(state.free_slots) == bitmap.array_to_mask(counts == 0)
+                )
+                if not consistent:
+                    drifted.append(group)
+                    self.stdout.write(self.style.WARNING(f'Group {group.id} ({group.name}) has drifted'))
+            checked += len(groups)
+
+        if drifted and options['repair']:
+            for offset in range(0, len(drifted), chunk_size):
+                recompute_groups(drifted[offset:offset + chunk_size], force=True)
+            self.stdout.write(f'Recomputed {len(drifted)} groups')
+
+        style = self.style.WARNING if drifted else self.style.SUCCESS
+        self.stdout.write(style(f'Checked {checked} groups, {len(drifted)} drifted'))
@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from schedules.availability import deferred_invalidation
+from schedules.coalesce import coalesce_busy_times
+from schedules.models import BusyTime
+
+
+class Command(BaseCommand):
+    help = "Merge every user's adjacent and overlapping busy times into one row per block"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500, help='Users per chunk')
+        parser.add_argument('--dry-run', action='store_true', help='Only report how many rows would be removed')
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        chunk_size = options['chunk_size']
+        user_ids = list(BusyTime.objects.order_by('user_id').values_list('user_id', flat=True).distinct())
+        chunks = [user_ids[i:i + chunk_size] for i in range(0, len(user_ids), chunk_size)]
+        self.stdout.write(f'{"Checking" if dry_run else "Compacting"} {len(user_ids)} users in {len(chunks)} chunks')
+
+        started = time.monotonic()
+        removed = 0
+        for index, chunk in enumerate(chunks):
+            # Each chunk commits on its own, so an interrupted run can simply be started again
+            with transaction.atomic(), deferred_invalidation():
+                removed += coalesce_busy_times(chunk, dry_run=dry_run)
+            self.stdout.write(f'[{index + 1}/{len(chunks)}] {removed} rows {"to remove" if dry_run else "removed"}')
+
+        elapsed = time.monotonic() - started
+        if dry_run:
+            self.stdout.write(self.style.SUCCESS(f'{removed} rows would be removed ({elapsed:.1f}s)'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Removed {removed} rows in {elapsed:.1f}s'))
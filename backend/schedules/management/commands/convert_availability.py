@@ -0,0 +1,76 @@
+import time
+from itertools import groupby
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from schedules.availability import mark_user_groups_stale, recompute_groups, user_group_ids
+from schedules.engine import DAYS_PER_WEEK
+from schedules.legacy import busy_times_for, interval_minutes
+from schedules.models import Availability, BusyTime, Group
+
+
+class Command(BaseCommand):
+    help = "Convert users' legacy availability into busy times (the complement of each day)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=200, help='Users per transaction')
+        parser.add_argument('--dry-run', action='store_true', help='Only report how many busy times would be created')
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        chunk_size = options['chunk_size']
+        # A user's Availability rows are deleted in the transaction that creates
+        # their busy times, so whoever still has rows is not converted yet and a
+        # rerun or resume picks up exactly those users
+        user_ids = list(Availability.objects.order_by('user_id').values_list('user_id', flat=True).distinct())
+        self.stdout.write(
+            f'{"Checking" if dry_run else "Converting"} availability of {len(user_ids)} users, {chunk_size} users per chunk'
+        )
+
+        started = time.monotonic()
+        users_done = created = 0
+        group_ids = set()
+        for offset in range(0, len(user_ids), chunk_size):
+            chunk = user_ids[offset:offset + chunk_size]
+            rows = (
+                Availability.objects.filter(user_id__in=chunk).order_by('user_id')
+                .values_list('user_id', 'day_of_week', 'start_time', 'end_time')
+                .iterator(chunk_size=2000)
+            )
+            busy_times = []
+            for user_id, user_rows in groupby(rows, key=lambda row: row[0]):
+                available = [[] for _ in range(DAYS_PER_WEEK)]
+                for _, day_of_week, start_time, end_time in user_rows:
+                    available[day_of_week].append(interval_minutes(start_time, end_time))
+                busy_times.extend(busy_times_for(user_id, available))
+
+            if not dry_run:
+                with transaction.atomic():
+                    BusyTime.objects.bulk_create(busy_times, batch_size=500, ignore_conflicts=True)
+                    Availability.objects.filter(user_id__in=chunk).delete()
+                    # bulk_create skips the signals that keep profiles and groups in sync
+                    mark_user_groups_stale(chunk)
+                group_ids.update(user_group_ids(chunk))
+            users_done += len(chunk)
+            created += len(busy_times)
+            elapsed = time.monotonic() - started
+            self.stdout.write(
+                f'{users_done} users, {created} busy times, '
+                f'{users_done / elapsed if elapsed else 0:.1f} users/s'
+            )
+
+        if dry_run:
+            self.stdout.write(self.style.SUCCESS(f'{created} busy times would be created for {users_done} users'))
+            return
+
+        # One batched rebuild of every affected group, rather than one per chunk
+        group_ids = sorted(group_ids)
+        for offset in range(0, len(group_ids), chunk_size):
+            recompute_groups(Group.objects.filter(id__in=group_ids[offset:offset + chunk_size]))
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {created} busy times for {users_done} users, '
+            f'rebuilt {len(group_ids)} groups in {elapsed:.1f}s'
+        ))
@@ -0,0 +1,80 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from schedules.models import Availability, BusyTime
+
+
+MODELS = {'busytime': BusyTime, 'availability': Availability}
+KEY_FIELDS = ('user', 'day_of_week', 'start_time', 'end_time')
+
+
+def delete_duplicates(model, first_user_id, last_user_id):
+    """
+    Delete every row of `model` for users in [first_user_id, last_user_id] that
+    repeats another row's key, keeping the lowest id, in a single statement.
+    Exact duplicates never change what a user is busy or free, so this skips the
+    model signals on purpose. Returns the number of rows deleted.
+    """
+    qn = connection.ops.quote_name
+    table = qn(model._meta.db_table)
+    key = ', '.join(qn(model._meta.get_field(field).column) for field in KEY_FIELDS)
+    user = qn(model._meta.get_field('user').column)
+    # The keepers go through a derived table so MySQL accepts the self-reference
+    sql = (
+        f'DELETE FROM {table} WHERE {user} BETWEEN %s AND %s AND {qn("id")} NOT IN ('
+        f'SELECT keep_id FROM (SELECT MIN({qn("id")}) AS keep_id FROM {table} '
+        f'WHERE {user} BETWEEN %s AND %s GROUP BY {key}) AS keepers)'
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [first_user_id, last_user_id, first_user_id, last_user_id])
+        return cursor.rowcount
+
+
+def count_duplicates(model, first_user_id, last_user_id):
+    rows = model.objects.filter(user_id__gte=first_user_id, user_id__lte=last_user_id)
+    return rows.count() - rows.values(*KEY_FIELDS).distinct().count()
+
+
+class Command(BaseCommand):
+    help = "Remove duplicate BusyTime and Availability rows, keeping the oldest of each"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model', choices=[*MODELS, 'all'], default='all', help='Which table to clean')
+        parser.add_argument('--chunk-size', type=int, default=500, help='Users per chunk; each chunk commits on its own')
+        parser.add_argument('--dry-run', action='store_true', help='Only count the duplicate rows')
+
+    def handle(self, *args, **options):
+        models = MODELS.values() if options['model'] == 'all' else [MODELS[options['model']]]
+        for model in models:
+            self.deduplicate(model, options['chunk_size'], options['dry_run'])
+
+    def deduplicate(self, model, chunk_size, dry_run):
+        name = f'{model.__name__} rows'
+        user_ids = list(model.objects.order_by('user_id').values_list('user_id', flat=True).distinct())
+        chunks = [user_ids[i:i + chunk_size] for i in range(0, len(user_ids), chunk_size)]
+        self.stdout.write(f'{"Checking" if dry_run else "Deduplicating"} {name} of {len(user_ids)} users in {len(chunks)} chunks')
+
+        started = time.monotonic()
+        removed = 0
+        for index, chunk in enumerate(chunks):
+            if dry_run:
+                removed += count_duplicates(model, chunk[0], chunk[-1])
+            else:
+                with transaction.atomic():
+                    removed += delete_duplicates(model, chunk[0], chunk[-1])
+            elapsed = time.monotonic() - started
+            self.stdout.write(
+                f'[{index + 1}/{len(chunks)}] {removed} duplicates, '
+                f'{removed / elapsed if elapsed else 0:.1f} rows/s'
+            )
+
+        elapsed = time.monotonic() - started
+        if dry_run:
+            self.stdout.write(self.style.SUCCESS(f'{removed} duplicate {name} would be removed ({elapsed:.1f}s)'))
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f'Removed {removed} duplicate {name} in {elapsed:.1f}s '
+                f'({removed / elapsed if elapsed else 0:.1f} rows/s)'
+            ))
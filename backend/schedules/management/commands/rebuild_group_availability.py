@@ -0,0 +1,131 @@
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from schedules import bitmap
+from schedules.availability import build_groups_busy_counts, recompute_groups
+from schedules.models import Group, GroupAvailabilityState
+
+
+def rebuild_chunk(group_ids, dry_run=False):
+    """
+    Rebuild one chunk of groups and return (groups, changed).
+    For a dry run nothing is written and `changed` is how many stored rows
+    (one per group) would change; otherwise every row is rewritten.
+    """
+    groups = list(Group.objects.filter(id__in=group_ids))
+    if not dry_run:
+        recompute_groups(groups, force=True)
+        return len(groups), len(groups)
+
+    stored = {
+        state.group_id: (
+            bytes(state.busy_counts), state.member_count, state.slot_minutes, state.count_minutes, state.zone_offsets
+        )
+        for state in GroupAvailabilityState.objects.filter(group_id__in=group_ids)
+    }
+    busy_counts = build_groups_busy_counts(groups)
+    changed = 0
+    for group in groups:
+        counts, member_count, zone_offsets, count_minutes = busy_counts[group.id]
+        expected = (bitmap.pack_counts(counts), member_count, group.slot_minutes, count_minutes, zone_offsets)
+        if stored.get(group.id) != expected:
+            changed += 1
+    return len(groups), changed
+
+
+def worker_pool(workers):
+    """
+    Process pool for rebuilding chunks. Forked children inherit the loaded
+    Django setup; where fork is unavailable (Windows) they are spawned and
+    set Django up themselves.
+    """
+    if 'fork' in multiprocessing.get_all_start_methods():
+        return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('fork'))
+    return ProcessPoolExecutor(
+        max_workers=workers, mp_context=multiprocessing.get_context('spawn'), initializer=django.setup
+    )
+
+
+class Command(BaseCommand):
+    help = "Rebuild every group's stored free time"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=200, help='Groups per chunk')
+        parser.add_argument('--workers', type=int, default=1,
+                            help='Worker processes; each opens its own database connection')
+        parser.add_argument('--checkpoint', default='.rebuild_group_availability.json',
+                            help='File recording the last fully rebuilt group id')
+        parser.add_argument('--resume', action='store_true', help='Continue after the group recorded in the checkpoint')
+        parser.add_argument('--dry-run', action='store_true', help='Only report how many rows would change')
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        checkpoint = options['checkpoint']
+
+        group_ids = Group.objects.order_by('id').values_list('id', flat=True)
+        if options['resume'] and os.path.exists(checkpoint):
+            with open(checkpoint) as f:
+                last_group_id = json.load(f)['last_group_id']
+            group_ids = group_ids.filter(id__gt=last_group_id)
+            self.stdout.write(f'Resuming after group {last_group_id}')
+        group_ids = list(group_ids)
+
+        chunk_size = options['chunk_size']
+        chunks = [group_ids[i:i + chunk_size] for i in range(0, len(group_ids), chunk_size)]
+        self.stdout.write(f'{"Checking" if dry_run else "Rebuilding"} {len(group_ids)} groups in {len(chunks)} chunks')
+
+        started = time.monotonic()
+        completed = set()
+        next_chunk = 0
+        groups_done = rows_total = 0
+
+        def chunk_done(index, groups, rows):
+            nonlocal next_chunk, groups_done, rows_total
+            groups_done += groups
+            rows_total += rows
+            completed.add(index)
+            # Only advance the checkpoint over a contiguous prefix of finished chunks
+            while next_chunk in completed:
+                next_chunk += 1
+            if not dry_run and next_chunk:
+                with open(checkpoint, 'w') as f:
+                    json.dump({'last_group_id': chunks[next_chunk - 1][-1]}, f)
+            elapsed = time.monotonic() - started
+            self.stdout.write(
+                f'[{len(completed)}/{len(chunks)}] {groups_done} groups, '
+                f'{groups_done / elapsed if elapsed else 0:.1f} groups/s'
+            )
+
+        if options['workers'] > 1:
+            # Children must not share the parent's connection; each opens its own
+            connections.close_all()
+            with worker_pool(options['workers']) as pool:
+                futures = {
+                    pool.submit(rebuild_chunk, chunk, dry_run): index for index, chunk in enumerate(chunks)
+                }
+                for future in as_completed(futures):
+                    chunk_done(futures[future], *future.result())
+        else:
+            for index, chunk in enumerate(chunks):
+                chunk_done(index, *rebuild_chunk(chunk, dry_run))
+
+        elapsed = time.monotonic() - started
+        if dry_run:
+            self.stdout.write(self.style.SUCCESS(
+                f'{rows_total} of {groups_done} stored rows would change ({elapsed:.1f}s)'
+            ))
+            return
+
+        if os.path.exists(checkpoint):
+            os.remove(checkpoint)
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt {groups_done} groups in {elapsed:.1f}s '
+            f'({groups_done / elapsed if elapsed else 0:.1f} groups/s)'
+        ))
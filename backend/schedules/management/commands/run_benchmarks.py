@@ -0,0 +1,72 @@
+import json
+import platform
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from schedules.benchmarks import runner
+from schedules.benchmarks.data import bench_groups, bench_users
+from schedules.models import BusyTime
+
+
+class Command(BaseCommand):
+    help = 'Time the scheduling engines and API endpoints against seeded benchmark data'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=5, help='Runs per benchmark')
+        parser.add_argument('--output', help='Write results to this JSON file')
+        parser.add_argument('--compare', help='Baseline JSON file to compare medians against')
+        parser.add_argument('--threshold', type=float, default=1.2,
+                            help='Fail when a median is this many times slower than the baseline')
+        parser.add_argument('--skip-endpoints', action='store_true', help='Only time the engines')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        try:
+            results = runner.run(
+                repeat=options['repeat'],
+                include_endpoints=not options['skip_endpoints'],
+                seed=options['seed']
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        report = {
+            'created_at': timezone.now().isoformat(),
+            'python': platform.python_version(),
+            'dataset': {
+                'users': bench_users().count(),
+                'groups': bench_groups().count(),
+                'busy_times': BusyTime.objects.filter(user__in=bench_users()).count(),
+            },
+            'repeat': options['repeat'],
+            'results': results,
+        }
+
+        for name, timing in results.items():
+            self.stdout.write(f"{name:<32} median {timing['median'] * 1000:9.2f} ms   min {timing['min'] * 1000:9.2f} ms")
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(f"Results written to {options['output']}")
+
+        if options['compare']:
+            self.compare(results, options['compare'], options['threshold'])
+
+    def compare(self, results, baseline_path, threshold):
+        with open(baseline_path) as f:
+            baseline = json.load(f)['results']
+
+        regressions = []
+        for name, timing in results.items():
+            if name not in baseline:
+                continue
+            ratio = timing['median'] / baseline[name]['median']
+            self.stdout.write(f'{name:<32} {ratio:6.2f}x baseline')
+            if ratio > threshold:
+                regressions.append(f'{name} ({ratio:.2f}x)')
+
+        if regressions:
+            raise CommandError(f"Slower than baseline: {', '.join(regressions)}")
+        self.stdout.write(self.style.SUCCESS('No regressions against baseline'))
@@ -0,0 +1,64 @@
+import os
+import socket
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from schedules.jobs import claim_jobs, purge_failed_jobs, run_jobs
+
+
+class Command(BaseCommand):
+    help = 'Process queued group free time recomputes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Drain the queue once and exit')
+        parser.add_argument('--poll-interval', type=float, default=1.0, help='Seconds to sleep when the queue is empty')
+        parser.add_argument('--batch-size', type=int, default=10, help='Jobs claimed per poll')
+        parser.add_argument('--settle-seconds', type=float, default=0.5,
+                            help='Leave freshly requested jobs alone this long so bursts coalesce')
+        parser.add_argument('--max-backoff', type=float, default=60.0,
+                            help='Longest wait, in seconds, between retries after a database error')
+
+    def handle(self, *args, **options):
+        worker_id = f'{socket.gethostname()}:{os.getpid()}'
+        self.stdout.write(f'Recompute worker {worker_id} started')
+
+        failures = 0
+        while True:
+            try:
+                drained = self.poll(worker_id, options)
+            except Exception as e:
+                if options['once']:
+                    raise CommandError(f'Recompute worker failed: {e}') from e
+                # e.g. SQLite's "database is locked": drop the connection, back off and retry
+                failures += 1
+                delay = min(options['max_backoff'], options['poll_interval'] * 2 ** failures)
+                self.stderr.write(f'Recompute worker error ({e}); retrying in {delay:.1f}s')
+                connection.close()
+                time.sleep(delay)
+                continue
+            failures = 0
+            if drained:
+                if options['once']:
+                    break
+                time.sleep(options['poll_interval'])
+
+    def poll(self, worker_id, options):
+        """Run one batch of jobs; returns True when there was nothing to do"""
+        for group_id, last_error in purge_failed_jobs():
+            self.stderr.write(f'Gave up recomputing group {group_id}: {last_error}')
+
+        jobs = claim_jobs(
+            worker_id,
+            limit=options['batch_size'],
+            settle_seconds=0 if options['once'] else options['settle_seconds']
+        )
+        if not jobs:
+            return True
+        started = time.monotonic()
+        if run_jobs(jobs):
+            self.stdout.write(f'Recomputed {len(jobs)} groups in {time.monotonic() - started:.3f}s')
+        else:
+            self.stderr.write(f'Failed to recompute {len(jobs)} groups')
+        return False
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+
+from schedules.benchmarks.data import bench_users, clear_bench_data, seed
+
+
+class Command(BaseCommand):
+    help = 'Generate synthetic users, groups and busy times for benchmarks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--groups', type=int, default=50)
+        parser.add_argument('--group-size', type=int, default=8)
+        parser.add_argument('--overlap', type=float, default=0.3,
+                            help='Share of each group drawn from a pool of popular users (0-1)')
+        parser.add_argument('--fragmentation', type=float, default=0.15,
+                            help='Chance of a free hole in any busy cell (0-1)')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--clear', action='store_true', help='Remove existing benchmark data first')
+
+    def handle(self, *args, **options):
+        if options['clear']:
+            clear_bench_data()
+        elif bench_users().exists():
+            self.stderr.write('Benchmark data already exists; pass --clear to regenerate it')
+            return
+
+        summary = seed(
+            users=options['users'],
+            groups=options['groups'],
+            group_size=options['group_size'],
+            overlap=options['overlap'],
+            fragmentation=options['fragmentation'],
+            seed=options['seed']
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {summary['users']} users, {summary['groups']} groups and {summary['busy_times']} busy times"
+        ))
@@ -0,0 +1,45 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from schedules import sweep
+from schedules.availability import mark_user_groups_stale
+from schedules.models import BusyProfile
+from schedules.profiles import unpack_profile
+
+
+class Command(BaseCommand):
+    help = "Rebuild users' busy profiles from their BusyTime rows and report any drift"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500, help='Users per chunk')
+        parser.add_argument('--repair', action='store_true',
+                            help='Store the rebuilt profiles and mark the affected groups stale')
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        user_ids = list(User.objects.order_by('id').values_list('id', flat=True))
+
+        drifted = []
+        for offset in range(0, len(user_ids), chunk_size):
+            chunk = user_ids[offset:offset + chunk_size]
+            expected = sweep.member_profiles(chunk)
+            stored = dict(BusyProfile.objects.filter(user_id__in=chunk).values_list('user_id', 'intervals'))
+            for user_id in chunk:
+                if user_id not in stored:
+                    # Built on first use; only worth reporting if it has rows
+                    if any(expected[user_id]):
+                        drifted.append(user_id)
+                        self.stdout.write(self.style.WARNING(f'User {user_id} has busy times but no profile'))
+                elif unpack_profile(stored[user_id]) != expected[user_id]:
+                    drifted.append(user_id)
+                    self.stdout.write(self.style.WARNING(f'User {user_id} profile has drifted'))
+
+        if drifted and options['repair']:
+            for offset in range(0, len(drifted), chunk_size):
+                with transaction.atomic():
+                    mark_user_groups_stale(drifted[offset:offset + chunk_size])
+            self.stdout.write(f'Rebuilt {len(drifted)} profiles')
+
+        style = self.style.WARNING if drifted else self.style.SUCCESS
+        self.stdout.write(style(f'Checked {len(user_ids)} users, {len(drifted)} drifted'))
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 06:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schedules', '0003_busytime'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='group',
+            name='slot_minutes',
+            field=models.PositiveSmallIntegerField(choices=[(5, '5 minutes'), (15, '15 minutes'), (30, '30 minutes'), (60, '60 minutes')], default=30),
+        ),
+    ]
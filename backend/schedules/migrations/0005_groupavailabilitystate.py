@@ -0,0 +1,24 @@
+# Generated by Django 4.2.7 on 2026-10-18 06:26
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schedules', '0004_group_slot_minutes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GroupAvailabilityState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveIntegerField(default=1)),
+                ('computed_version', models.PositiveIntegerField(default=0)),
+                ('computed_at', models.DateTimeField(blank=True, null=True)),
+                ('group', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='availability_state', to='schedules.group')),
+            ],
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.7 on 2026-10-18 06:27
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schedules', '0005_groupavailabilitystate'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecomputeJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('requested_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('claimed_at', models.DateTimeField(blank=True, null=True)),
+                ('claimed_by', models.CharField(blank=True, max_length=100)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True)),
+                ('group', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='recompute_job', to='schedules.group')),
+            ],
+            options={
+                'ordering': ['requested_at'],
+            },
+        ),
+    ]
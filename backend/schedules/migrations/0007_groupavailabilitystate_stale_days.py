@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 06:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schedules', '0006_recomputejob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='groupavailabilitystate',
+            name='stale_days',
+            field=models.PositiveSmallIntegerField(default=127),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 4.2.7 on 2026-10-18 06:34
+
+from django.db import migrations, models
+
+
+def drop_row_storage(apps, schema_editor):
+    """Stored rows are replaced by bitmaps; force every group to be rebuilt"""
+    apps.get_model('schedules', 'GroupAvailability').objects.all().delete()
+    apps.get_model('schedules', 'GroupAvailabilityState').objects.update(computed_version=0, stale_days=0b1111111)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schedules', '0007_groupavailabilitystate_stale_days'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='groupavailabilitystate',
+            name='free_slots',
+            field=models.BinaryField(default=b''),
+        ),
+        migrations.AddField(
+            model_name='groupavailabilitystate',
+            name='member_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='groupavailabilitystate',
+            name='slot_minutes',
+            field=models.PositiveSmallIntegerField(default=30),
+        ),
+        migrations.RunPython(drop_row_storage, migrations.RunPython.noop),
+    ]
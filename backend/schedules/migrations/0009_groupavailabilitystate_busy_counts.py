@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 06:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schedules', '0008_compact_group_free_time'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='groupavailabilitystate',
+            name='busy_counts',
+            field=models.BinaryField(default=b''),
+        ),
+    ]
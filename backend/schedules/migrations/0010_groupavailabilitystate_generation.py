@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 06:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schedules', '0009_groupavailabilitystate_busy_counts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='groupavailabilitystate',
+            name='generation',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
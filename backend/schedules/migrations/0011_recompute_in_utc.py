@@ -0,0 +1,19 @@
+# Generated by Django 4.2.7 on 2026-10-18 06:45
+
+from django.db import migrations
+
+
+def mark_all_stale(apps, schema_editor):
+    """Stored results are now in UTC; force every group to be rebuilt"""
+    apps.get_model('schedules', 'GroupAvailabilityState').objects.update(computed_version=0, stale_days=0b1111111)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schedules', '0010_groupavailabilitystate_generation'),
+    ]
+
+    operations = [
+        migrations.RunPython(mark_all_stale, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 06:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schedules', '0011_recompute_in_utc'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='event',
+            name='date',
+            field=models.DateField(db_index=True),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.7 on 2026-10-18 06:47
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('schedules', '0012_event_date_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BusyProfile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('intervals', models.BinaryField(default=b'')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='busy_profile', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 4.2.7 on 2026-10-18 07:02
+
+from django.db import migrations, models
+
+
+def mark_all_stale(apps, schema_editor):
+    """Results stored so far don't record the offsets they used; rebuild them so they do"""
+    apps.get_model('schedules', 'GroupAvailabilityState').objects.update(computed_version=0, stale_days=0b1111111)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schedules', '0013_busyprofile'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='groupavailabilitystate',
+            name='zone_offsets',
+            field=models.JSONField(default=dict),
+        ),
+        migrations.RunPython(mark_all_stale, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,16 @@
+# Generated by Django 4.2.7 on 2026-10-18 07:09
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schedules', '0014_groupavailabilitystate_zone_offsets'),
+    ]
+
+    operations = [
+        migrations.DeleteModel(
+            name='GroupAvailability',
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.7 on 2026-10-18 07:20
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def mark_all_stale(apps, schema_editor):
+    """
+    Counts stored so far are at the slot size. Record that, and rebuild them,
+    since zones off the slot grid were rounded when rotated.
+    """
+    apps.get_model('schedules', 'GroupAvailabilityState').objects.update(
+        count_minutes=F('slot_minutes'), computed_version=0, stale_days=0b1111111
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schedules', '0015_delete_groupavailability'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='groupavailabilitystate',
+            name='count_minutes',
+            field=models.PositiveSmallIntegerField(default=30),
+        ),
+        migrations.RunPython(mark_all_stale, migrations.RunPython.noop),
+    ]
@@ -1,14 +1,25 @@
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator, MaxValueValidator
 
+from .engine import MINUTES_PER_DAY, start_minute
+
 
 class Group(models.Model):
+    SLOT_MINUTES_CHOICES = [
+        (5, '5 minutes'),
+        (15, '15 minutes'),
+        (30, '30 minutes'),
+        (60, '60 minutes'),
+    ]
+
     name = models.CharField(max_length=200)
     description = models.TextField(blank=True)
     creator = models.ForeignKey(User, on_delete=models.CASCADE, related_name='created_groups')
     members = models.ManyToManyField(User, related_name='schedule_groups', blank=True)
     invite_code = models.CharField(max_length=8, unique=True, default='')
+    slot_minutes = models.PositiveSmallIntegerField(choices=SLOT_MINUTES_CHOICES, default=30)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -62,6 +73,19 @@ class BusyTime(models.Model):
         return f"{self.user.username} BUSY - {self.get_day_of_week_display()} {self.start_time}-{self.end_time}"
 
 
+class BusyProfile(models.Model):
+    """
+    A user's BusyTime rows merged into one weekly profile, rebuilt in the same
+    transaction whenever the rows change (see schedules.profiles).
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='busy_profile')
+    intervals = models.BinaryField(default=b'')
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.user.username} busy profile"
+
+
 # Keep the old Availability model for backward compatibility during migration
 class Availability(models.Model):
     DAYS_OF_WEEK = [
@@ -93,7 +117,7 @@ class Event(models.Model):
     name = models.CharField(max_length=200)
     description = models.TextField(blank=True)
     group = models.ForeignKey(Group, on_delete=models.CASCADE, related_name='events')
-    date = models.DateField()
+    date = models.DateField(db_index=True)
     start_time = models.TimeField()
     end_time = models.TimeField()
     created_by = models.ForeignKey(User, on_delete=models.CASCADE)
@@ -106,20 +130,81 @@ class Event(models.Model):
         ordering = ['-date', '-start_time']
 
 
-class GroupAvailability(models.Model):
+class GroupFreeInterval:
     """
-    Computed common FREE time slots for a group (when NO ONE is busy)
+    Common FREE time of a group (when NO ONE is busy), as served by the API.
+    Expanded from GroupAvailabilityState and never stored; the id is the minute
+    of the week the interval starts at, so it stays the same across recomputes.
     """
-    group = models.ForeignKey(Group, on_delete=models.CASCADE, related_name='common_availabilities')
-    day_of_week = models.IntegerField(choices=BusyTime.DAYS_OF_WEEK)
-    start_time = models.TimeField()
-    end_time = models.TimeField()
-    member_count = models.IntegerField(default=0)  # Total members considered for this calculation
-    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __init__(self, day_of_week, start_time, end_time, member_count, group_id=None, created_at=None):
+        self.id = day_of_week * MINUTES_PER_DAY + start_minute(start_time)
+        self.group_id = group_id
+        self.day_of_week = day_of_week
+        self.start_time = start_time
+        self.end_time = end_time
+        self.member_count = member_count  # Total members considered for this calculation
+        self.created_at = created_at
+
+    def get_day_of_week_display(self):
+        return dict(BusyTime.DAYS_OF_WEEK)[self.day_of_week]
+
+
+class GroupAvailabilityState(models.Model):
+    """
+    Tracks whether a group's stored free time is current.
+    `version` is bumped whenever a member's busy times or the membership change;
+    `computed_version` is the version the stored result was built from.
+    `stale_days` is a bitmask (bit 0 = Monday) of the days whose stored result is outdated,
+    as local days of the members who changed them.
+    `generation` counts the results published for the group; each one replaces the
+    previous result in a single UPDATE, so readers always see a complete week.
+    The computed free time itself is kept here as one packed bitmap of the week's
+    slots (see schedules.bitmap), together with `busy_counts`, the number of busy
+    members in each slot, so membership changes can be applied by adding or
+    subtracting one member's profile. Both are kept at `count_minutes`, the
+    largest divisor of `slot_minutes` that every member's zone offset is a
+    multiple of, so moving them between UTC and a member's zone never cuts a
+    slot; they are combined into `slot_minutes` slots when served.
+    `zone_offsets` records the {zone name: offset} the members' profiles were
+    rotated into UTC by; once a zone's offset moves (daylight saving) the stored
+    result is outdated.
+    """
+    group = models.OneToOneField(Group, on_delete=models.CASCADE, related_name='availability_state')
+    version = models.PositiveIntegerField(default=1)
+    computed_version = models.PositiveIntegerField(default=0)
+    stale_days = models.PositiveSmallIntegerField(default=0b1111111)
+    slot_minutes = models.PositiveSmallIntegerField(default=30)
+    count_minutes = models.PositiveSmallIntegerField(default=30)
+    free_slots = models.BinaryField(default=b'')
+    busy_counts = models.BinaryField(default=b'')
+    member_count = models.IntegerField(default=0)
+    zone_offsets = models.JSONField(default=dict)
+    computed_at = models.DateTimeField(null=True, blank=True)
+    generation = models.PositiveIntegerField(default=0)
+
+    @property
+    def is_stale(self):
+        return self.computed_version != self.version
+
+    def __str__(self):
+        return f"{self.group.name} availability v{self.computed_version}/{self.version}"
+
+
+class RecomputeJob(models.Model):
+    """
+    A pending background recompute of a group's free time.
+    There is at most one row per group, so a burst of edits coalesces into one recompute.
+    """
+    group = models.OneToOneField(Group, on_delete=models.CASCADE, related_name='recompute_job')
+    requested_at = models.DateTimeField(default=timezone.now)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    claimed_by = models.CharField(max_length=100, blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
 
     class Meta:
-        unique_together = ['group', 'day_of_week', 'start_time', 'end_time']
-        ordering = ['day_of_week', 'start_time']
+        ordering = ['requested_at']
 
     def __str__(self):
-        return f"{self.group.name} FREE - {self.get_day_of_week_display()} {self.start_time}-{self.end_time} ({self.member_count} members)"
+        return f"Recompute {self.group.name} (requested {self.requested_at})"
@@ -0,0 +1,63 @@
+"""
+Persisted per-user weekly busy profiles.
+
+A user's BusyTime rows are merged into one BusyProfile value whenever they
+change, so group computations read one small value per member instead of
+every row. Intervals are packed as little-endian uint16 (start, end) pairs
+of week minutes, counting from Monday 00:00.
+"""
+
+import numpy as np
+
+from . import sweep
+from .engine import DAYS_PER_WEEK, MINUTES_PER_DAY
+from .models import BusyProfile
+
+
+def pack_profile(profile):
+    """Pack [merged (start, end) intervals per day] into bytes"""
+    minutes = [
+        day_of_week * MINUTES_PER_DAY + minute
+        for day_of_week, intervals in enumerate(profile)
+        for interval in intervals
+        for minute in interval
+    ]
+    return np.asarray(minutes, dtype='<u2').tobytes()
+
+
+def unpack_profile(data):
+    profile = [[] for _ in range(DAYS_PER_WEEK)]
+    minutes = np.frombuffer(bytes(data), dtype='<u2').astype(int).tolist()
+    for start, end in zip(minutes[::2], minutes[1::2]):
+        day_of_week = start // MINUTES_PER_DAY
+        offset = day_of_week * MINUTES_PER_DAY
+        profile[day_of_week].append((start - offset, end - offset))
+    return profile
+
+
+def rebuild_busy_profiles(user_ids):
+    """Rebuild the given users' profiles from their BusyTime rows; returns the profiles"""
+    profiles = sweep.member_profiles(user_ids)
+    BusyProfile.objects.bulk_create(
+        [BusyProfile(user_id=user_id, intervals=pack_profile(profile)) for user_id, profile in profiles.items()],
+        update_conflicts=True,
+        unique_fields=['user'],
+        update_fields=['intervals', 'updated_at']
+    )
+    return profiles
+
+
+def load_busy_profiles(user_ids):
+    """
+    {user_id: [merged busy intervals for Monday, ..., Sunday]} from the stored
+    profiles. Users without one yet are built from their rows and stored.
+    """
+    user_ids = set(user_ids)
+    profiles = {
+        user_id: unpack_profile(intervals)
+        for user_id, intervals in BusyProfile.objects.filter(user_id__in=user_ids).values_list('user_id', 'intervals')
+    }
+    missing = user_ids - profiles.keys()
+    if missing:
+        profiles.update(rebuild_busy_profiles(missing))
+    return profiles
@@ -1,6 +1,7 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
-from .models import Group, Availability, BusyTime, Event, GroupAvailability
+from .models import Group, Availability, BusyTime, Event
+from .jobs import availability_status
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -30,7 +31,8 @@ class BusyTimeSerializer(serializers.ModelSerializer):
         return busy_time
 
 
-# Keep AvailabilitySerializer for backward compatibility during migration
+# Keep AvailabilitySerializer for backward compatibility during migration.
+# The rows it reads and validates are translated to and from busy times (see schedules.legacy).
 class AvailabilitySerializer(serializers.ModelSerializer):
     day_name = serializers.CharField(source='get_day_of_week_display', read_only=True)
 
@@ -39,11 +41,13 @@ class AvailabilitySerializer(serializers.ModelSerializer):
         fields = ('id', 'day_of_week', 'day_name', 'start_time', 'end_time', 'created_at')
         read_only_fields = ('id', 'created_at')
 
-    def create(self, validated_data):
-        validated_data['user'] = self.context['request'].user
-        # Use get_or_create to prevent duplicates
-        availability, created = Availability.objects.get_or_create(**validated_data)
-        return availability
+    def validate(self, data):
+        # A partial update keeps the current value of any time it leaves out
+        start_time = data.get('start_time', getattr(self.instance, 'start_time', None))
+        end_time = data.get('end_time', getattr(self.instance, 'end_time', None))
+        if start_time is not None and end_time is not None and start_time >= end_time:
+            raise serializers.ValidationError("Start time must be before end time")
+        return data
 
 
 class GroupSerializer(serializers.ModelSerializer):
@@ -51,15 +55,19 @@ class GroupSerializer(serializers.ModelSerializer):
     members = UserSerializer(many=True, read_only=True)
     member_count = serializers.SerializerMethodField()
     invite_code = serializers.CharField(read_only=True)
+    availability_status = serializers.SerializerMethodField()
 
     class Meta:
         model = Group
-        fields = ('id', 'name', 'description', 'creator', 'members', 'member_count', 'invite_code', 'created_at')
+        fields = ('id', 'name', 'description', 'creator', 'members', 'member_count', 'invite_code', 'slot_minutes', 'availability_status', 'created_at')
         read_only_fields = ('id', 'creator', 'created_at')
 
     def get_member_count(self, obj):
         return obj.members.count()
 
+    def get_availability_status(self, obj):
+        return availability_status(obj)
+
     def create(self, validated_data):
         validated_data['creator'] = self.context['request'].user
         return super().create(validated_data)
@@ -79,13 +87,15 @@ class EventSerializer(serializers.ModelSerializer):
         return super().create(validated_data)
 
 
-class GroupAvailabilitySerializer(serializers.ModelSerializer):
+class GroupAvailabilitySerializer(serializers.Serializer):
+    """Read-only; serializes the GroupFreeInterval rows expanded from a group's stored state"""
+    id = serializers.IntegerField(read_only=True)
+    day_of_week = serializers.IntegerField(read_only=True)
     day_name = serializers.CharField(source='get_day_of_week_display', read_only=True)
-
-    class Meta:
-        model = GroupAvailability
-        fields = ('id', 'day_of_week', 'day_name', 'start_time', 'end_time', 'member_count', 'created_at')
-        read_only_fields = ('id', 'created_at')
+    start_time = serializers.TimeField(read_only=True)
+    end_time = serializers.TimeField(read_only=True)
+    member_count = serializers.IntegerField(read_only=True)
+    created_at = serializers.DateTimeField(read_only=True)
 
 
 class GroupMembershipSerializer(serializers.Serializer):
@@ -99,6 +109,49 @@ class GroupMembershipSerializer(serializers.Serializer):
         return value
 
 
+class BestWindowsSerializer(serializers.Serializer):
+    duration = serializers.IntegerField(min_value=1, max_value=24 * 60)
+    days = serializers.CharField(required=False)
+    start_time = serializers.TimeField(required=False)
+    end_time = serializers.TimeField(required=False)
+    min_attendance = serializers.IntegerField(min_value=1, default=1)
+    limit = serializers.IntegerField(min_value=1, max_value=50, default=5)
+
+    def validate_days(self, value):
+        try:
+            days = [int(day) for day in value.split(',')]
+        except ValueError:
+            days = None
+        if not days or any(day not in range(7) for day in days):
+            raise serializers.ValidationError("Days must be comma-separated numbers from 0 (Monday) to 6 (Sunday)")
+        return days
+
+    def validate(self, data):
+        if 'start_time' in data and 'end_time' in data and data['start_time'] >= data['end_time']:
+            raise serializers.ValidationError("Start time must be before end time")
+        return data
+
+
+class CommonFreeTimeSerializer(serializers.Serializer):
+    user_ids = serializers.ListField(child=serializers.IntegerField(), min_length=1, max_length=500)
+    slot_minutes = serializers.ChoiceField(choices=Group.SLOT_MINUTES_CHOICES, default=30)
+
+
+class DateRangeSerializer(serializers.Serializer):
+    MAX_DAYS = 366
+
+    start_date = serializers.DateField()
+    end_date = serializers.DateField()
+
+    def validate(self, data):
+        days = (data['end_date'] - data['start_date']).days + 1
+        if days < 1:
+            raise serializers.ValidationError("End date must not be before start date")
+        if days > self.MAX_DAYS:
+            raise serializers.ValidationError(f"Date ranges are limited to {self.MAX_DAYS} days")
+        return data
+
+
 class JoinGroupSerializer(serializers.Serializer):
     invite_code = serializers.CharField(max_length=8)
 
@@ -0,0 +1,68 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
+from django.contrib.auth.models import User
+from django.dispatch import receiver
+from authentication.models import UserProfile
+from .availability import mark_groups_stale, mark_user_groups_stale, user_group_ids
+from .models import BusyTime, Group
+
+
+@receiver(pre_save, sender=BusyTime)
+def busy_time_saving(sender, instance, raw, **kwargs):
+    # Remember the stored day so an update that moves the row flags both days
+    instance._stored_day_of_week = None
+    if not raw and not instance._state.adding:
+        instance._stored_day_of_week = (
+            sender.objects.filter(pk=instance.pk).values_list('day_of_week', flat=True).first()
+        )
+
+
+@receiver(post_save, sender=BusyTime)
+def busy_time_saved(sender, instance, created, **kwargs):
+    stored_day = getattr(instance, '_stored_day_of_week', None)
+    if created:
+        days = [instance.day_of_week]
+    elif stored_day is None:
+        # Previous day unknown (e.g. a fixture load), so every day may have changed
+        days = None
+    else:
+        days = sorted({stored_day, instance.day_of_week})
+    mark_user_groups_stale([instance.user_id], days)
+
+
+@receiver(post_delete, sender=BusyTime)
+def busy_time_deleted(sender, instance, origin=None, **kwargs):
+    if getattr(origin, 'model', type(origin)) is User:
+        # The user itself is being deleted, so there is no profile left to rebuild
+        mark_groups_stale(user_group_ids([instance.user_id]))
+        return
+    mark_user_groups_stale([instance.user_id], [instance.day_of_week])
+
+
+@receiver(pre_save, sender=UserProfile)
+def user_profile_saving(sender, instance, raw, **kwargs):
+    instance._stored_timezone = None
+    if not raw and not instance._state.adding:
+        instance._stored_timezone = sender.objects.filter(pk=instance.pk).values_list('timezone', flat=True).first()
+
+
+@receiver(post_save, sender=UserProfile)
+def user_profile_saved(sender, instance, created, **kwargs):
+    # Busy times are entered in the user's zone, so moving zones shifts them all
+    stored_timezone = getattr(instance, '_stored_timezone', None)
+    if stored_timezone is not None and stored_timezone != instance.timezone:
+        mark_user_groups_stale([instance.user_id])
+
+
+@receiver(m2m_changed, sender=Group.members.through)
+def group_members_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if not reverse:
+        # group.members.add/remove/clear
+        mark_groups_stale([instance.pk])
+    elif action == 'pre_clear':
+        # user.schedule_groups.clear()
+        mark_groups_stale(list(instance.schedule_groups.values_list('id', flat=True)))
+    else:
+        # user.schedule_groups.add/remove
+        mark_groups_stale(pk_set)
@@ -0,0 +1,68 @@
+"""
+Single-flight locks so only one caller at a time recomputes the same thing.
+
+A key is guarded by a threading lock for callers in this process and an
+flock()ed file under RECOMPUTE_LOCK_DIR for the other worker processes on
+the host. Platforms without fcntl fall back to the threading lock alone.
+"""
+
+import os
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+_registry_lock = threading.Lock()
+_thread_locks = {}
+
+
+def _thread_lock(key):
+    with _registry_lock:
+        if key not in _thread_locks:
+            _thread_locks[key] = threading.Lock()
+        return _thread_locks[key]
+
+
+@contextmanager
+def _file_lock(key, blocking):
+    if fcntl is None:
+        yield True
+        return
+    os.makedirs(settings.RECOMPUTE_LOCK_DIR, exist_ok=True)
+    fd = os.open(os.path.join(settings.RECOMPUTE_LOCK_DIR, f'{key}.lock'), os.O_CREAT | os.O_RDWR, 0o644)
+    try:
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+    finally:
+        os.close(fd)
+
+
+@contextmanager
+def single_flight(key, blocking=True):
+    """
+    Hold the flight for `key` for the duration of the block.
+    Yields True once acquired; with blocking=False it yields False straight
+    away when another thread or process already holds it.
+    """
+    thread_lock = _thread_lock(key)
+    if not thread_lock.acquire(blocking=blocking):
+        yield False
+        return
+    try:
+        with _file_lock(key, blocking) as acquired:
+            yield acquired
+    finally:
+        thread_lock.release()
@@ -0,0 +1,66 @@
+"""
+Sweep-line merging of busy intervals.
+
+A user's busy intervals for a day are sorted once and merged in a single
+pass, which absorbs the overlapping and duplicate blocks users are allowed
+to store. The gaps between merged blocks are the free time.
+"""
+
+from .engine import DAYS_PER_WEEK, MINUTES_PER_DAY, end_minute, start_minute
+from .models import BusyTime
+
+
+def group_member_ids(group):
+    """Ids of everyone considered for a group's free time, creator included"""
+    member_ids = list(group.members.values_list('id', flat=True))
+    if group.creator_id not in member_ids:
+        member_ids.append(group.creator_id)
+    return member_ids
+
+
+def merge_intervals(intervals):
+    """Merge overlapping and touching (start, end) intervals"""
+    merged = []
+    for start, end in sorted(intervals):
+        if start >= end:
+            continue
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1][1] = end
+        else:
+            merged.append([start, end])
+    return [(start, end) for start, end in merged]
+
+
+def free_intervals(busy_intervals, day_start=0, day_end=MINUTES_PER_DAY):
+    """Return the gaps between the merged busy intervals within a day"""
+    gaps = []
+    cursor = day_start
+    for start, end in merge_intervals(busy_intervals):
+        if start > cursor:
+            gaps.append((cursor, min(start, day_end)))
+        cursor = max(cursor, end)
+        if cursor >= day_end:
+            break
+    if cursor < day_end:
+        gaps.append((cursor, day_end))
+    return gaps
+
+
+def member_profiles(user_ids, days=None):
+    """
+    Load the busy times of all given users with one query and merge them into
+    weekly profiles: {user_id: [merged busy intervals for Monday, ..., Sunday]}.
+    When `days` is given only those days are loaded; the others stay empty.
+    """
+    by_user = {user_id: [[] for _ in range(DAYS_PER_WEEK)] for user_id in user_ids}
+    rows = BusyTime.objects.filter(user_id__in=by_user)
+    if days is not None:
+        rows = rows.filter(day_of_week__in=days)
+    rows = rows.values_list('user_id', 'day_of_week', 'start_time', 'end_time')
+    for user_id, day_of_week, start_time, end_time in rows:
+        by_user[user_id][day_of_week].append((start_minute(start_time), end_minute(end_time)))
+    return {
+        user_id: [merge_intervals(intervals) for intervals in days]
+        for user_id, days in by_user.items()
+    }
@@ -0,0 +1,602 @@
+from datetime import datetime, time, timedelta
+
+from django.contrib.auth.models import User
+from django.db import IntegrityError, transaction
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+import numpy as np
+from authentication.models import UserProfile
+
+from . import bitmap
+from .availability import (
+    build_groups_busy_counts, calculate_group_free_time, deferred_invalidation, is_current, update_membership
+)
+from .engine import END_OF_DAY
+from .models import BusyTime, Group, GroupAvailabilityState
+from .profiles import rebuild_busy_profiles
+
+
+def reference_free_slots(busy_rows):
+    """
+    Free half-hour slots as the original calculate_group_free_time found them:
+    a slot is free unless some busy row overlaps it. The original loop stopped
+    before 23:30; that last slot, ending at 23:59, is included here.
+    """
+    slots = []
+    current = time(0, 0)
+    while current < time(23, 30):
+        next_time = (datetime.combine(datetime.today(), current) + timedelta(minutes=30)).time()
+        slots.append((current, next_time))
+        current = next_time
+    slots.append((time(23, 30), END_OF_DAY))
+
+    free = []
+    for day_of_week in range(7):
+        day_rows = [(start, end) for day, start, end in busy_rows if day == day_of_week]
+        for start_time, end_time in slots:
+            if not any(start < end_time and end > start_time for start, end in day_rows):
+                free.append((day_of_week, start_time, end_time))
+    return free
+
+
+def merge_slots(slots):
+    """Join consecutive slots of the same day into intervals"""
+    merged = []
+    for day_of_week, start_time, end_time in slots:
+        if merged and merged[-1][0] == day_of_week and merged[-1][2] == start_time:
+            merged[-1] = (day_of_week, merged[-1][1], end_time)
+        else:
+            merged.append((day_of_week, start_time, end_time))
+    return merged
+
+
+@override_settings(RECOMPUTE_IN_BACKGROUND=False)
+class GroupFreeTimeTests(TestCase):
+    """The stored free time matches the original slot-by-slot calculation"""
+
+    def setUp(self):
+        self.creator = User.objects.create_user(username='creator', password='pass')
+        self.member = User.objects.create_user(username='member', password='pass')
+        self.group = Group.objects.create(name='Team', creator=self.creator)
+        self.client = APIClient()
+        self.client.force_authenticate(self.creator)
+
+    def add_busy(self, user, day_of_week, start_time, end_time):
+        BusyTime.objects.create(user=user, day_of_week=day_of_week, start_time=start_time, end_time=end_time)
+        return day_of_week, start_time, end_time
+
+    def fetch(self, granularity=None):
+        url = f'/api/groups/{self.group.id}/availability/'
+        if granularity:
+            url += f'?granularity={granularity}'
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def assert_matches_reference(self, busy_rows, member_count):
+        expected = reference_free_slots(busy_rows)
+        for rows, reference in ((self.fetch('slot'), expected), (self.fetch(), merge_slots(expected))):
+            self.assertEqual(
+                [(row['day_of_week'], row['start_time'], row['end_time']) for row in rows],
+                [(day, start.strftime('%H:%M:%S'), end.strftime('%H:%M:%S')) for day, start, end in reference]
+            )
+            self.assertEqual({row['member_count'] for row in rows}, {member_count})
+            self.assertEqual(len({row['id'] for row in rows}), len(rows))
+
+    def test_empty_group_is_free_all_week(self):
+        self.assert_matches_reference([], member_count=1)
+        self.assertEqual(len(self.fetch('slot')), 7 * 48)
+
+    def test_last_slot_of_the_day(self):
+        self.group.members.add(self.member)
+        busy_rows = [
+            self.add_busy(self.creator, 0, time(23, 0), time(23, 30)),
+            self.add_busy(self.member, 1, time(23, 30), END_OF_DAY),
+            self.add_busy(self.member, 2, time(22, 0), time(23, 45)),
+        ]
+        self.assert_matches_reference(busy_rows, member_count=2)
+        slots = {(row['day_of_week'], row['start_time']) for row in self.fetch('slot')}
+        self.assertIn((0, '23:30:00'), slots)
+        self.assertNotIn((1, '23:30:00'), slots)
+        self.assertNotIn((2, '23:30:00'), slots)
+
+    def test_overlapping_rows(self):
+        self.group.members.add(self.member)
+        busy_rows = [
+            self.add_busy(self.creator, 3, time(9, 0), time(10, 30)),
+            self.add_busy(self.creator, 3, time(10, 0), time(11, 0)),
+            self.add_busy(self.member, 3, time(9, 30), time(12, 0)),
+            self.add_busy(self.member, 3, time(11, 0), time(11, 30)),
+            # Partial slots block the whole slot
+            self.add_busy(self.member, 4, time(14, 10), time(14, 20)),
+            self.add_busy(self.creator, 4, time(14, 15), time(15, 5)),
+        ]
+        self.assert_matches_reference(busy_rows, member_count=2)
+
+    def test_results_follow_edits(self):
+        self.group.members.add(self.member)
+        busy_rows = [self.add_busy(self.member, 5, time(8, 0), time(9, 0))]
+        self.assert_matches_reference(busy_rows, member_count=2)
+
+        busy_rows.append(self.add_busy(self.creator, 5, time(8, 30), time(13, 0)))
+        self.assert_matches_reference(busy_rows, member_count=2)
+
+        self.group.members.remove(self.member)
+        self.assert_matches_reference(busy_rows[1:], member_count=1)
+
+    def test_recomputing_some_days_keeps_the_others(self):
+        busy_rows = [self.add_busy(self.creator, 1, time(9, 0), time(10, 0))]
+        self.assert_matches_reference(busy_rows, member_count=1)
+
+        # Written without signals, so only an explicit recompute picks them up
+        BusyTime.objects.bulk_create([
+            BusyTime(user=self.creator, day_of_week=1, start_time=time(12, 0), end_time=time(13, 0)),
+            BusyTime(user=self.creator, day_of_week=4, start_time=time(12, 0), end_time=time(13, 0)),
+        ])
+        rebuild_busy_profiles([self.creator.id])
+        calculate_group_free_time(self.group, days=[4], force=True)
+        self.assert_matches_reference(busy_rows + [(4, time(12, 0), time(13, 0))], member_count=1)
+
+        calculate_group_free_time(self.group, force=True)
+        busy_rows += [(1, time(12, 0), time(13, 0)), (4, time(12, 0), time(13, 0))]
+        self.assert_matches_reference(busy_rows, member_count=1)
+
+
+@override_settings(RECOMPUTE_IN_BACKGROUND=False)
+class ReplaceWeekTests(TestCase):
+    """PUT /busy-times/week/ writes only the difference and recomputes once"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='user', password='pass')
+        self.group = Group.objects.create(name='Team', creator=self.user)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def put_week(self, busy_times):
+        return self.client.put('/api/busy-times/week/', {'busy_times': [
+            {'day_of_week': day_of_week, 'start_time': start_time, 'end_time': end_time}
+            for day_of_week, start_time, end_time in busy_times
+        ]}, format='json')
+
+    def stored(self):
+        return {
+            (day_of_week, start_time.strftime('%H:%M'), end_time.strftime('%H:%M')): busy_time_id
+            for busy_time_id, day_of_week, start_time, end_time
+            in BusyTime.objects.filter(user=self.user).values_list('id', 'day_of_week', 'start_time', 'end_time')
+        }
+
+    def test_only_the_difference_is_written(self):
+        self.put_week([(0, '09:00', '10:00'), (1, '09:00', '10:00'), (2, '13:00', '14:00')])
+        before = self.stored()
+
+        response = self.put_week([(0, '09:00', '10:00'), (1, '10:00', '11:00'), (2, '13:00', '14:00'), (4, '08:00', '09:00')])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['created_count'], 2)
+        self.assertEqual(response.data['deleted_count'], 1)
+        self.assertEqual(response.data['unchanged_count'], 2)
+        self.assertEqual(response.data['changed_days'], [1, 4])
+
+        after = self.stored()
+        self.assertEqual(set(after), {(0, '09:00', '10:00'), (1, '10:00', '11:00'), (2, '13:00', '14:00'), (4, '08:00', '09:00')})
+        # Unchanged rows are kept, not rewritten
+        self.assertEqual(after[0, '09:00', '10:00'], before[0, '09:00', '10:00'])
+        self.assertEqual(after[2, '13:00', '14:00'], before[2, '13:00', '14:00'])
+
+    def test_same_week_changes_nothing(self):
+        week = [(3, '09:00', '12:00'), (3, '09:00', '12:00')]
+        self.put_week(week)
+        before = self.stored()
+        generation = GroupAvailabilityState.objects.get(group=self.group).generation
+
+        response = self.put_week(week)
+        self.assertEqual(response.data['changed_days'], [])
+        self.assertEqual(response.data['created_count'], 0)
+        self.assertEqual(self.stored(), before)
+        self.assertEqual(GroupAvailabilityState.objects.get(group=self.group).generation, generation)
+
+    def test_invalid_week_is_not_applied(self):
+        self.put_week([(0, '09:00', '10:00')])
+        response = self.put_week([(1, '09:00', '10:00'), (2, '11:00', '10:00')])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(self.stored()), {(0, '09:00', '10:00')})
+
+    def test_group_free_time_follows_the_new_week(self):
+        self.put_week([(0, '00:00', '23:59')])
+        self.put_week([(1, '00:00', '23:59')])
+        days = {row['day_of_week'] for row in self.client.get(f'/api/groups/{self.group.id}/availability/').data}
+        self.assertEqual(days, {0, 2, 3, 4, 5, 6})
+
+    def test_failed_block_keeps_its_error(self):
+        other = Group.objects.create(name='Other', creator=self.user)
+        with self.assertRaises(IntegrityError):
+            with transaction.atomic(), deferred_invalidation():
+                BusyTime.objects.create(user=self.user, day_of_week=0, start_time=time(9), end_time=time(10))
+                Group.objects.bulk_create([Group(name='Clash', creator=self.user, invite_code=other.invite_code)])
+        self.assertFalse(BusyTime.objects.filter(user=self.user).exists())
+
+
+@override_settings(RECOMPUTE_IN_BACKGROUND=False)
+class LegacyAvailabilityTests(TestCase):
+    """/availabilities/ reads and writes the complement of the user's busy times"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='user', password='pass')
+        self.group = Group.objects.create(name='Team', creator=self.user)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.assertEqual(self.client.delete('/api/availabilities/clear_all/').status_code, 200)
+
+    def available(self):
+        return [
+            (row['day_of_week'], row['start_time'][:5], row['end_time'][:5])
+            for row in self.client.get('/api/availabilities/').data['results']
+        ]
+
+    def busy(self, day_of_week):
+        return [
+            (start_time.strftime('%H:%M'), end_time.strftime('%H:%M'))
+            for start_time, end_time in BusyTime.objects.filter(user=self.user, day_of_week=day_of_week)
+            .values_list('start_time', 'end_time')
+        ]
+
+    def generation(self):
+        return GroupAvailabilityState.objects.get(group=self.group).generation
+
+    def group_free(self):
+        rows = self.client.get(f'/api/groups/{self.group.id}/availability/').data
+        return [(row['day_of_week'], row['start_time'][:5], row['end_time'][:5]) for row in rows]
+
+    def test_create(self):
+        response = self.client.post(
+            '/api/availabilities/', {'day_of_week': 0, 'start_time': '09:00', 'end_time': '12:00'}, format='json'
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['id'], 9 * 60)
+        self.assertEqual(self.available(), [(0, '09:00', '12:00')])
+        self.assertEqual(self.busy(0), [('00:00', '09:00'), ('12:00', '23:59')])
+        self.assertEqual(self.group_free(), [(0, '09:00', '12:00')])
+
+        # An overlapping interval joins the one already there
+        response = self.client.post(
+            '/api/availabilities/', {'day_of_week': 0, 'start_time': '11:00', 'end_time': '13:00'}, format='json'
+        )
+        self.assertEqual((response.data['start_time'][:5], response.data['end_time'][:5]), ('09:00', '13:00'))
+        self.assertEqual(self.available(), [(0, '09:00', '13:00')])
+        self.assertEqual(self.group_free(), [(0, '09:00', '13:00')])
+
+        # Already available, so nothing is written or recomputed
+        generation = self.generation()
+        self.client.post('/api/availabilities/', {'day_of_week': 0, 'start_time': '10:00', 'end_time': '11:00'}, format='json')
+        self.assertEqual(self.generation(), generation)
+
+    def test_patch(self):
+        self.client.post('/api/availabilities/', {'day_of_week': 0, 'start_time': '09:00', 'end_time': '12:00'}, format='json')
+        response = self.client.patch('/api/availabilities/540/', {'end_time': '10:00'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.available(), [(0, '09:00', '10:00')])
+
+        response = self.client.patch('/api/availabilities/540/', {'day_of_week': 2}, format='json')
+        self.assertEqual(response.data['id'], 2 * 24 * 60 + 540)
+        self.assertEqual(self.available(), [(2, '09:00', '10:00')])
+        self.assertEqual(self.busy(0), [('00:00', '23:59')])
+        self.assertEqual(self.group_free(), [(2, '09:00', '10:00')])
+        self.assertEqual(self.client.patch('/api/availabilities/540/', {'end_time': '11:00'}, format='json').status_code, 404)
+
+    def test_clear_all(self):
+        self.assertEqual(self.available(), [])
+        self.assertEqual(self.group_free(), [])
+        for day_of_week in range(7):
+            self.assertEqual(self.busy(day_of_week), [('00:00', '23:59')])
+
+        self.client.post('/api/availabilities/', {'day_of_week': 4, 'start_time': '00:00', 'end_time': '23:59'}, format='json')
+        self.client.post('/api/availabilities/', {'day_of_week': 5, 'start_time': '08:00', 'end_time': '09:00'}, format='json')
+        self.assertEqual(self.available(), [(4, '00:00', '23:59'), (5, '08:00', '09:00')])
+        self.assertEqual(self.busy(4), [])
+
+        self.client.delete('/api/availabilities/clear_all/')
+        self.assertEqual(self.available(), [])
+        self.assertEqual(self.busy(4), [('00:00', '23:59')])
+        self.assertEqual(self.busy(5), [('00:00', '23:59')])
+        self.assertEqual(self.group_free(), [])
+        generation = self.generation()
+        self.client.delete('/api/availabilities/clear_all/')
+        self.assertEqual(self.generation(), generation)
+
+
+@override_settings(RECOMPUTE_IN_BACKGROUND=False)
+class BusyTimeCellTests(TestCase):
+    """Rows listed as grid cells, and cell ids written back"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='user', password='pass')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def add_busy(self, day_of_week, start_time, end_time):
+        return BusyTime.objects.create(user=self.user, day_of_week=day_of_week, start_time=start_time, end_time=end_time)
+
+    def stored(self):
+        return list(BusyTime.objects.filter(user=self.user).values_list('day_of_week', 'start_time', 'end_time'))
+
+    def cells(self, query=''):
+        response = self.client.get(f'/api/busy-times/{query}')
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_cells_are_split_before_paging(self):
+        single = self.add_busy(0, time(8, 0), time(8, 30))
+        self.add_busy(0, time(9, 0), time(21, 0))
+        data = self.cells('?cell_minutes=30')
+        self.assertEqual(data['count'], 25)
+        self.assertEqual(len(data['results']), 20)
+        self.assertEqual(data['results'][0]['id'], single.id)
+        self.assertEqual(
+            [(cell['start_time'], cell['end_time']) for cell in data['results'][1:3]],
+            [('09:00:00', '09:30:00'), ('09:30:00', '10:00:00')]
+        )
+        self.assertTrue(all(cell['id'] < 0 for cell in data['results'][1:]))
+        self.assertEqual(len(self.client.get(data['next']).data['results']), 5)
+
+    def test_rows_are_listed_whole_unless_coalescing(self):
+        self.add_busy(2, time(9, 0), time(10, 0))
+        self.assertEqual(self.cells()['count'], 1)
+        self.assertEqual(self.cells('?cell_minutes=15')['count'], 4)
+        with override_settings(BUSY_TIME_COALESCE=True):
+            self.assertEqual(self.cells()['count'], 2)
+        self.assertEqual(self.client.get('/api/busy-times/?cell_minutes=7').status_code, 400)
+
+    def test_deleting_a_cell(self):
+        self.add_busy(1, time(9, 0), time(11, 0))
+        cell = self.cells('?cell_minutes=30')['results'][1]
+        self.assertEqual(self.client.delete(f'/api/busy-times/{cell["id"]}/').status_code, 204)
+        self.assertEqual(self.stored(), [(1, time(9, 0), time(9, 30)), (1, time(10, 0), time(11, 0))])
+        self.assertEqual(self.client.delete(f'/api/busy-times/{cell["id"]}/').status_code, 404)
+
+    def test_updating_a_cell(self):
+        self.add_busy(1, time(9, 0), time(11, 0))
+        cells = self.cells('?cell_minutes=30')['results']
+        response = self.client.patch(f'/api/busy-times/{cells[3]["id"]}/', {'day_of_week': 4}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['day_of_week'], response.data['start_time']), (4, '10:30:00'))
+        self.assertEqual(self.stored(), [(1, time(9, 0), time(10, 30)), (4, time(10, 30), time(11, 0))])
+
+        response = self.client.put(
+            f'/api/busy-times/{cells[0]["id"]}/',
+            {'day_of_week': 1, 'start_time': '13:00', 'end_time': '14:00'},
+            format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            self.stored(),
+            [(1, time(9, 30), time(10, 30)), (1, time(13, 0), time(14, 0)), (4, time(10, 30), time(11, 0))]
+        )
+        self.assertEqual(self.client.patch(f'/api/busy-times/{cells[0]["id"]}/', {}, format='json').status_code, 404)
+
+
+@override_settings(RECOMPUTE_IN_BACKGROUND=False)
+class ZoneTests(TestCase):
+    """Busy times are entered in each member's zone and shown in the viewer's"""
+
+    def make_user(self, username, zone='UTC'):
+        user = User.objects.create_user(username=username, password='pass')
+        UserProfile.objects.filter(user=user).update(timezone=zone)
+        return user
+
+    def make_group(self, users, slot_minutes=30):
+        group = Group.objects.create(name='Team', creator=users[0], slot_minutes=slot_minutes)
+        group.members.add(*users[1:])
+        return group
+
+    def free_on(self, viewer, group, day_of_week):
+        client = APIClient()
+        client.force_authenticate(viewer)
+        response = client.get(f'/api/groups/{group.id}/availability/')
+        self.assertEqual(response.status_code, 200)
+        return [(row['start_time'][:5], row['end_time'][:5]) for row in response.data if row['day_of_week'] == day_of_week]
+
+    def test_half_hour_zone_at_hourly_slots(self):
+        first = self.make_user('first', 'Asia/Kolkata')
+        second = self.make_user('second', 'Asia/Kolkata')
+        group = self.make_group([first, second], slot_minutes=60)
+        BusyTime.objects.create(user=first, day_of_week=0, start_time=time(9), end_time=time(10))
+        self.assertEqual(self.free_on(first, group, 0), [('00:00', '09:00'), ('10:00', '23:59')])
+        self.assertEqual(GroupAvailabilityState.objects.get(group=group).count_minutes, 30)
+
+    def test_quarter_hour_zone_at_every_slot_size(self):
+        for slot_minutes in (15, 30, 60):
+            with self.subTest(slot_minutes=slot_minutes):
+                user = self.make_user(f'nepal{slot_minutes}', 'Asia/Kathmandu')
+                group = self.make_group([user], slot_minutes=slot_minutes)
+                BusyTime.objects.create(user=user, day_of_week=2, start_time=time(14), end_time=time(15))
+                self.assertEqual(self.free_on(user, group, 2), [('00:00', '14:00'), ('15:00', '23:59')])
+
+    def test_viewer_in_another_zone_sees_whole_slots(self):
+        member = self.make_user('member', 'Asia/Kolkata')
+        viewer = self.make_user('viewer')
+        group = self.make_group([viewer, member], slot_minutes=60)
+        # 09:00-10:00 in Kolkata is 03:30-04:30 UTC, which touches two UTC hours
+        BusyTime.objects.create(user=member, day_of_week=0, start_time=time(9), end_time=time(10))
+        self.assertEqual(self.free_on(viewer, group, 0), [('00:00', '03:00'), ('05:00', '23:59')])
+        self.assertEqual(self.free_on(member, group, 0), [('00:00', '09:00'), ('10:00', '23:59')])
+
+    def test_rotation_wraps_around_the_week(self):
+        tokyo = self.make_user('tokyo', 'Asia/Tokyo')
+        viewer = self.make_user('viewer')
+        group = self.make_group([viewer, tokyo])
+        # Monday 00:00-02:00 in Tokyo is Sunday 15:00-17:00 UTC
+        BusyTime.objects.create(user=tokyo, day_of_week=0, start_time=time(0), end_time=time(2))
+        self.assertEqual(self.free_on(viewer, group, 6), [('00:00', '15:00'), ('17:00', '23:59')])
+        self.assertEqual(self.free_on(viewer, group, 0), [('00:00', '23:59')])
+        self.assertEqual(self.free_on(tokyo, group, 0), [('02:00', '23:59')])
+
+        bogota = self.make_user('bogota', 'America/Bogota')
+        group.members.add(bogota)
+        # Sunday 22:00-23:59 in Bogota is Monday 03:00-05:00 UTC
+        BusyTime.objects.create(user=bogota, day_of_week=6, start_time=time(22), end_time=END_OF_DAY)
+        self.assertEqual(self.free_on(viewer, group, 0), [('00:00', '03:00'), ('05:00', '23:59')])
+
+    def test_edits_flag_only_the_local_day(self):
+        utc_user = self.make_user('utc')
+        kolkata = self.make_user('kolkata', 'Asia/Kolkata')
+        utc_group = self.make_group([utc_user])
+        kolkata_group = self.make_group([kolkata])
+        self.free_on(utc_user, utc_group, 0)
+        self.free_on(kolkata, kolkata_group, 0)
+
+        BusyTime.objects.create(user=utc_user, day_of_week=2, start_time=time(9), end_time=time(10))
+        # Tuesday 02:00-03:00 in Kolkata is Monday 20:30-21:30 UTC
+        BusyTime.objects.create(user=kolkata, day_of_week=1, start_time=time(2), end_time=time(3))
+        for group, day_of_week in ((utc_group, 2), (kolkata_group, 1)):
+            self.assertEqual(GroupAvailabilityState.objects.get(group=group).stale_days, 1 << day_of_week)
+        self.assertEqual(self.free_on(utc_user, utc_group, 2), [('00:00', '09:00'), ('10:00', '23:59')])
+        self.assertEqual(self.free_on(kolkata, kolkata_group, 1), [('00:00', '02:00'), ('03:00', '23:59')])
+
+    def test_heatmap_in_a_half_hour_zone(self):
+        first = self.make_user('first', 'Asia/Kolkata')
+        second = self.make_user('second', 'Asia/Kolkata')
+        group = self.make_group([first, second], slot_minutes=60)
+        BusyTime.objects.create(user=second, day_of_week=0, start_time=time(9), end_time=time(10))
+        client = APIClient()
+        client.force_authenticate(first)
+        monday = client.get(f'/api/groups/{group.id}/heatmap/').data['free_counts'][0]
+        self.assertEqual(monday[8:11], [2, 1, 2])
+
+    def test_common_free_time_in_a_half_hour_zone(self):
+        first = self.make_user('first', 'Asia/Kolkata')
+        second = self.make_user('second', 'Asia/Kolkata')
+        self.make_group([first, second])
+        BusyTime.objects.create(user=second, day_of_week=0, start_time=time(9), end_time=time(10))
+        client = APIClient()
+        client.force_authenticate(first)
+        response = client.post(
+            '/api/groups/common_free_time/', {'user_ids': [first.id, second.id], 'slot_minutes': 60}, format='json'
+        )
+        monday = [(row['start_time'][:5], row['end_time'][:5]) for row in response.data if row['day_of_week'] == 0]
+        self.assertEqual(monday, [('00:00', '09:00'), ('10:00', '23:59')])
+
+
+@override_settings(RECOMPUTE_IN_BACKGROUND=False)
+class BestWindowsTests(TestCase):
+    """
+    Everyone is busy all week except Monday 10:00-12:00 and Wednesday
+    14:00-15:00, when all three are free, and Tuesday 09:00-11:00, when two are
+    """
+
+    def setUp(self):
+        self.creator = User.objects.create_user(username='creator', password='pass')
+        self.first = User.objects.create_user(username='first', password='pass')
+        self.second = User.objects.create_user(username='second', password='pass')
+        self.group = Group.objects.create(name='Team', creator=self.creator)
+        self.group.members.add(self.first, self.second)
+        shared = {0: (time(10), time(12)), 2: (time(14), time(15))}
+        for user in (self.creator, self.first, self.second):
+            free = dict(shared)
+            if user != self.second:
+                free[1] = (time(9), time(11))
+            for day_of_week in range(7):
+                if day_of_week not in free:
+                    self.add_busy(user, day_of_week, time(0), END_OF_DAY)
+                    continue
+                start_time, end_time = free[day_of_week]
+                self.add_busy(user, day_of_week, time(0), start_time)
+                self.add_busy(user, day_of_week, end_time, END_OF_DAY)
+        self.client = APIClient()
+        self.client.force_authenticate(self.creator)
+
+    def add_busy(self, user, day_of_week, start_time, end_time):
+        BusyTime.objects.create(user=user, day_of_week=day_of_week, start_time=start_time, end_time=end_time)
+
+    def windows(self, **params):
+        response = self.client.get(f'/api/groups/{self.group.id}/best_windows/', params)
+        self.assertEqual(response.status_code, 200)
+        return [
+            (
+                window['day_of_week'], window['start_time'].strftime('%H:%M'), window['end_time'].strftime('%H:%M'),
+                window['attendance']
+            )
+            for window in response.data['windows']
+        ]
+
+    def test_ranked_by_attendance_then_earliest_start(self):
+        self.assertEqual(self.windows(duration=60), [
+            (0, '10:00', '11:00', 3),
+            (0, '11:00', '12:00', 3),
+            (2, '14:00', '15:00', 3),
+            (1, '09:00', '10:00', 2),
+            (1, '10:00', '11:00', 2),
+        ])
+        self.assertEqual(self.windows(duration=60, limit=2), [(0, '10:00', '11:00', 3), (0, '11:00', '12:00', 3)])
+
+    def test_overlapping_windows_are_skipped(self):
+        # 10:30-11:30 is as good as the Monday windows around it, but overlaps both
+        self.assertEqual(self.windows(duration=90, min_attendance=3), [(0, '10:00', '11:30', 3)])
+        self.assertEqual(self.windows(duration=120, min_attendance=2), [(0, '10:00', '12:00', 3), (1, '09:00', '11:00', 2)])
+
+    def test_day_and_time_bounds(self):
+        self.assertEqual(
+            self.windows(duration=60, days='1,2', start_time='09:30', end_time='15:00'),
+            [(2, '14:00', '15:00', 3), (1, '09:30', '10:30', 2)]
+        )
+        self.assertEqual(self.windows(duration=60, days='1,2', start_time='09:30', end_time='14:30'), [(1, '09:30', '10:30', 2)])
+        self.assertEqual(self.windows(duration=60, days='3'), [])
+        self.assertEqual(self.windows(duration=120, start_time='10:30', end_time='12:00'), [])
+        self.assertEqual(self.client.get(f'/api/groups/{self.group.id}/best_windows/', {'duration': 60, 'days': '7'}).status_code, 400)
+
+
+@override_settings(RECOMPUTE_IN_BACKGROUND=False)
+class MembershipTests(TestCase):
+    """Applying a membership change to the stored counts matches a full recompute"""
+
+    def setUp(self):
+        self.creator = User.objects.create_user(username='creator', password='pass')
+        self.first = User.objects.create_user(username='first', password='pass')
+        self.second = User.objects.create_user(username='second', password='pass')
+        self.group = Group.objects.create(name='Team', creator=self.creator)
+        self.group.members.add(self.first)
+        for day_of_week, user in enumerate((self.creator, self.first, self.second)):
+            BusyTime.objects.create(user=user, day_of_week=day_of_week, start_time=time(9), end_time=time(12))
+            BusyTime.objects.create(user=user, day_of_week=3, start_time=time(8 + day_of_week), end_time=time(13))
+        calculate_group_free_time(self.group)
+
+    def assert_matches_full_recompute(self):
+        state = GroupAvailabilityState.objects.get(group=self.group)
+        counts, member_count, zone_offsets, count_minutes = build_groups_busy_counts([self.group])[self.group.id]
+        self.assertTrue(is_current(state, self.group))
+        self.assertEqual((state.member_count, state.zone_offsets, state.count_minutes), (member_count, zone_offsets, count_minutes))
+        self.assertTrue(np.array_equal(bitmap.unpack_counts(state.busy_counts, state.count_minutes), counts))
+        self.assertEqual(bitmap.unpack(state.free_slots), bitmap.array_to_mask(counts == 0))
+
+    def test_joining_and_leaving(self):
+        self.assertTrue(update_membership(self.group, self.second, joined=True))
+        self.assert_matches_full_recompute()
+        self.assertTrue(update_membership(self.group, self.first, joined=False))
+        self.assert_matches_full_recompute()
+        self.assertTrue(update_membership(self.group, self.second, joined=False))
+        self.assert_matches_full_recompute()
+
+    def test_joining_from_another_zone(self):
+        UserProfile.objects.filter(user=self.second).update(timezone='Asia/Tokyo')
+        self.assertTrue(update_membership(self.group, self.second, joined=True))
+        self.assert_matches_full_recompute()
+        self.assertEqual(GroupAvailabilityState.objects.get(group=self.group).zone_offsets, {'Asia/Tokyo': 540})
+
+    def test_joining_off_the_stored_grid_needs_a_recompute(self):
+        UserProfile.objects.filter(user=self.second).update(timezone='Asia/Kathmandu')
+        self.assertFalse(update_membership(self.group, self.second, joined=True))
+        self.assertFalse(is_current(GroupAvailabilityState.objects.get(group=self.group), self.group))
+        calculate_group_free_time(self.group)
+        self.assert_matches_full_recompute()
+        self.assertEqual(GroupAvailabilityState.objects.get(group=self.group).count_minutes, 15)
+
+    def test_through_the_api(self):
+        client = APIClient()
+        client.force_authenticate(self.creator)
+        generation = GroupAvailabilityState.objects.get(group=self.group).generation
+        response = client.post(f'/api/groups/{self.group.id}/add_member/', {'user_id': self.second.id}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assert_matches_full_recompute()
+        response = client.post(f'/api/groups/{self.group.id}/remove_member/', {'user_id': self.first.id}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assert_matches_full_recompute()
+        self.assertEqual(GroupAvailabilityState.objects.get(group=self.group).generation, generation + 2)
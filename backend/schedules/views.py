@@ -1,100 +1,40 @@
-from datetime import time, timedelta, datetime
 from collections import defaultdict
-from django.db.models import Q
+from django.db.models import Exists, OuterRef, Q
 from rest_framework import viewsets, status, serializers
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from django.conf import settings
+from django.db import transaction
+from django.http import Http404
 from django.contrib.auth.models import User
-from .models import Group, Availability, Event, GroupAvailability
-from .serializers import (
-    GroupSerializer, AvailabilitySerializer, EventSerializer, 
-    GroupAvailabilitySerializer, GroupMembershipSerializer, JoinGroupSerializer
-)
-
-
-from datetime import time, timedelta, datetime
-from collections import defaultdict
-from django.db.models import Q
-from rest_framework import viewsets, status, serializers
-from rest_framework.decorators import action
-from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated
-from django.contrib.auth.models import User
-from .models import Group, Availability, BusyTime, Event, GroupAvailability
+from .models import Group, Availability, BusyTime, Event, GroupAvailabilityState, RecomputeJob
 from .serializers import (
     GroupSerializer, AvailabilitySerializer, BusyTimeSerializer, EventSerializer, 
-    GroupAvailabilitySerializer, GroupMembershipSerializer, JoinGroupSerializer
+    GroupAvailabilitySerializer, GroupMembershipSerializer, JoinGroupSerializer, BestWindowsSerializer,
+    CommonFreeTimeSerializer, DateRangeSerializer
+)
+from .availability import (
+    common_free_time, deferred_invalidation, expand_group_availability, free_counts, has_counts, is_current,
+    mark_user_groups_stale, quorum_slots, rank_windows, refresh_group_availability, update_membership,
+    user_group_ids, visible_user_ids
+)
+from .coalesce import (
+    DEFAULT_CELL_MINUTES, coalesce_busy_times, covering_busy_time, free_interval, merge_keys, parse_cell_id,
+    split_into_cells
+)
+from .daterange import iter_free_dates, member_event_intervals
+from .legacy import availability_id, availability_rows, change_day, interval_minutes
+from .zones import user_offsets, user_zone
+from .engine import (
+    DAYS_PER_WEEK, END_OF_DAY, MINUTES_PER_DAY, end_minute, minute_to_time, start_minute
 )
+from .sweep import group_member_ids
+from .jobs import availability_status, enqueue_recompute, schedule_recompute
 
 
-def calculate_group_free_time(group):
-    """
-    Calculate common FREE time slots for a group based on when NO ONE is busy.
-    This is the inverse of availability - we find times when nobody has marked themselves as busy.
-    Optimized for better performance.
-    """
-    GroupAvailability.objects.filter(group=group).delete()
-    
-    # Get all members including the creator
-    members = list(group.members.all())
-    if group.creator not in members:
-        members.append(group.creator)
-    
-    total_members = len(members)
-    if total_members < 1:
-        return
-
-    # Create time slots once (0:00 to 23:30 in 30-minute intervals)
-    all_time_slots = []
-    current_time = time(0, 0)
-    while current_time < time(23, 30):
-        next_time = (
-            datetime.combine(datetime.today(), current_time) + 
-            timedelta(minutes=30)
-        ).time()
-        all_time_slots.append((current_time, next_time))
-        current_time = next_time
-
-    # Process each day
-    for day_of_week in range(7):  # 0=Monday to 6=Sunday
-        # Get all busy times for all members on this day - single query
-        busy_times = BusyTime.objects.filter(
-            user__in=members,
-            day_of_week=day_of_week
-        ).values('start_time', 'end_time')
-        
-        # Convert to list for faster iteration
-        busy_times_list = list(busy_times)
-        
-        # Batch create free time slots
-        free_slots = []
-        
-        for start_time, end_time in all_time_slots:
-            # Check if any member is busy during this slot
-            slot_is_free = True
-            
-            for busy_time in busy_times_list:
-                # If the busy time overlaps with our slot, the slot is not free
-                if (busy_time['start_time'] < end_time and busy_time['end_time'] > start_time):
-                    slot_is_free = False
-                    break
-            
-            # If no one is busy during this slot, it's a free time for the group
-            if slot_is_free:
-                free_slots.append(
-                    GroupAvailability(
-                        group=group,
-                        day_of_week=day_of_week,
-                        start_time=start_time,
-                        end_time=end_time,
-                        member_count=total_members
-                    )
-                )
-        
-        # Batch create all free slots for this day
-        if free_slots:
-            GroupAvailability.objects.bulk_create(free_slots, ignore_conflicts=True)
+# Upper bound for a single batch request; a full week of 5-minute cells is 2016 items
+MAX_BATCH_SIZE = 5000
 
 
 class BusyTimeViewSet(viewsets.ModelViewSet):
@@ -107,37 +47,134 @@ class BusyTimeViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         return BusyTime.objects.filter(user=self.request.user)
 
+    def list(self, request, *args, **kwargs):
+        """
+        Pass ?cell_minutes=n (one of the group slot sizes) to get the rows split
+        into grid cells, as older clients expect one row per cell. With
+        BUSY_TIME_COALESCE rows are always split, into 30-minute cells by default,
+        since older clients never ask for cells.
+        """
+        cell_minutes = request.query_params.get('cell_minutes')
+        if cell_minutes is None:
+            if not settings.BUSY_TIME_COALESCE:
+                return super().list(request, *args, **kwargs)
+            cell_minutes = DEFAULT_CELL_MINUTES
+        try:
+            cell_minutes = int(cell_minutes)
+        except ValueError:
+            return Response({'error': 'cell_minutes must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+        if cell_minutes not in dict(Group.SLOT_MINUTES_CHOICES):
+            return Response({'error': 'Unsupported cell_minutes'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        # Pages are cut from the cells, so counts and links match what is returned
+        cells = split_into_cells(self.filter_queryset(self.get_queryset()), cell_minutes)
+        page = self.paginate_queryset(cells)
+        serializer = self.get_serializer(cells if page is None else page, many=True)
+        if page is None:
+            return Response(serializer.data)
+        return self.get_paginated_response(serializer.data)
+
+    # Writes run in a transaction so the BusyTime signals rebuild the user's
+    # busy profile atomically with the rows. With BUSY_TIME_COALESCE the touched
+    # days are merged too and the response shows the block the row ended up in.
+
     def perform_create(self, serializer):
-        serializer.save()
-        # Recalculate group free time for all groups this user is part of
-        self.recalculate_user_groups()
+        with transaction.atomic(), deferred_invalidation():
+            busy_time = serializer.save()
+            if settings.BUSY_TIME_COALESCE:
+                coalesce_busy_times([busy_time.user_id], [busy_time.day_of_week])
+                serializer.instance = covering_busy_time(busy_time)
+        # Recalculate the affected day for all groups this user is part of
+        self.recalculate_user_groups(days=[busy_time.day_of_week])
 
     def perform_update(self, serializer):
-        serializer.save()
-        # Recalculate group free time for all groups this user is part of
-        self.recalculate_user_groups()
+        previous_day = serializer.instance.day_of_week
+        with transaction.atomic(), deferred_invalidation():
+            busy_time = serializer.save()
+            if settings.BUSY_TIME_COALESCE:
+                coalesce_busy_times([busy_time.user_id], sorted({previous_day, busy_time.day_of_week}))
+                serializer.instance = covering_busy_time(busy_time)
+        # The row may have moved, so both its old and new day are affected
+        self.recalculate_user_groups(days=sorted({previous_day, busy_time.day_of_week}))
+
+    def update(self, request, *args, **kwargs):
+        """
+        Ids of cells from split listings update just that cell: it is freed and
+        the new times are added. A partial update keeps the cell's other fields.
+        """
+        cell = parse_cell_id(kwargs['pk'])
+        if cell is None:
+            return super().update(request, *args, **kwargs)
+        day_of_week, start, end = cell
+        data = request.data
+        if kwargs.get('partial'):
+            data = {
+                'day_of_week': day_of_week, 'start_time': minute_to_time(start), 'end_time': minute_to_time(end),
+                **dict(data.items())
+            }
+        serializer = self.get_serializer(data=data)
+        serializer.is_valid(raise_exception=True)
+        with transaction.atomic(), deferred_invalidation():
+            if not free_interval(request.user.id, day_of_week, start, end):
+                raise Http404
+            busy_time = serializer.save()
+            if settings.BUSY_TIME_COALESCE:
+                coalesce_busy_times([busy_time.user_id], sorted({day_of_week, busy_time.day_of_week}))
+                serializer.instance = covering_busy_time(busy_time)
+        self.recalculate_user_groups(days=sorted({day_of_week, busy_time.day_of_week}))
+        return Response(serializer.data)
+
+    def destroy(self, request, *args, **kwargs):
+        """Ids of cells from split listings free just that cell"""
+        cell = parse_cell_id(kwargs['pk'])
+        if cell is None:
+            return super().destroy(request, *args, **kwargs)
+        day_of_week, start, end = cell
+        with transaction.atomic(), deferred_invalidation():
+            changed = free_interval(request.user.id, day_of_week, start, end)
+        if not changed:
+            raise Http404
+        self.recalculate_user_groups(days=[day_of_week])
+        return Response(status=status.HTTP_204_NO_CONTENT)
 
     def perform_destroy(self, instance):
-        instance.delete()
-        # Recalculate group free time for all groups this user is part of
-        self.recalculate_user_groups()
+        day_of_week = instance.day_of_week
+        with transaction.atomic():
+            instance.delete()
+        # Recalculate the affected day for all groups this user is part of
+        self.recalculate_user_groups(days=[day_of_week])
 
-    def recalculate_user_groups(self):
+    def recalculate_user_groups(self, days=None):
         """Recalculate free time for all groups this user belongs to"""
-        user_groups = Group.objects.filter(
-            Q(creator=self.request.user) | Q(members=self.request.user)
-        ).distinct()
-        
-        for group in user_groups:
-            calculate_group_free_time(group)
+        schedule_recompute(user_group_ids([self.request.user.id]), days)
 
     @action(detail=False, methods=['delete'])
     def clear_all(self, request):
         """Clear all busy times for the current user"""
-        BusyTime.objects.filter(user=request.user).delete()
-        self.recalculate_user_groups()
+        busy_times = BusyTime.objects.filter(user=request.user)
+        changed_days = sorted(set(busy_times.values_list('day_of_week', flat=True)))
+        with transaction.atomic(), deferred_invalidation():
+            busy_times.delete()
+        self.recalculate_user_groups(days=changed_days)
         return Response({'message': 'All busy times cleared successfully'})
 
+    def validate_busy_times(self, busy_times_data):
+        """
+        Validate a list of busy time payloads in one pass without touching the database.
+        Returns the distinct (day_of_week, start_time, end_time) keys and per-item errors.
+        """
+        validator = BusyTimeSerializer(context={'request': self.request})
+        keys = {}
+        errors = []
+        for i, busy_time_data in enumerate(busy_times_data):
+            try:
+                data = validator.run_validation(busy_time_data)
+            except serializers.ValidationError as e:
+                errors.append(f"Item {i}: {e.detail}")
+                continue
+            keys[(data['day_of_week'], data['start_time'], data['end_time'])] = None
+        return list(keys), errors
+
     @action(detail=False, methods=['post'])
     def batch_create(self, request):
         """Create multiple busy times in batch for better performance"""
@@ -147,80 +184,198 @@ class BusyTimeViewSet(viewsets.ModelViewSet):
             return Response({'error': 'No busy times data provided'}, status=status.HTTP_400_BAD_REQUEST)
         
         # Add limit check for safety
-        if len(busy_times_data) > 100:
-            return Response({'error': 'Too many busy times in one request. Maximum 100 allowed.'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(busy_times_data) > MAX_BATCH_SIZE:
+            return Response({'error': f'Too many busy times in one request. Maximum {MAX_BATCH_SIZE} allowed.'}, status=status.HTTP_400_BAD_REQUEST)
         
-        created_busy_times = []
-        errors = []
+        keys, errors = self.validate_busy_times(busy_times_data)
+        requested_keys = keys
+        if settings.BUSY_TIME_COALESCE:
+            keys = merge_keys(keys)
         
-        for i, busy_time_data in enumerate(busy_times_data):
-            try:
-                busy_time_data['user'] = request.user.id
-                serializer = BusyTimeSerializer(data=busy_time_data, context={'request': request})
-                
-                if serializer.is_valid():
-                    busy_time = serializer.save()
-                    created_busy_times.append(busy_time)
-                else:
-                    errors.append(f"Item {i}: {serializer.errors}")
-            except Exception as e:
-                errors.append(f"Item {i}: Error creating busy time: {str(e)}")
+        # Skip rows the user already has, fetched with a single query
+        existing = set(
+            BusyTime.objects.filter(user=request.user).values_list('day_of_week', 'start_time', 'end_time')
+        )
+        new_busy_times = [
+            BusyTime(user=request.user, day_of_week=day_of_week, start_time=start_time, end_time=end_time)
+            for day_of_week, start_time, end_time in keys
+            if (day_of_week, start_time, end_time) not in existing
+        ]
         
-        # Recalculate group free time once after all creations
-        self.recalculate_user_groups()
+        if new_busy_times:
+            changed_days = sorted({busy_time.day_of_week for busy_time in new_busy_times})
+            with transaction.atomic(), deferred_invalidation():
+                BusyTime.objects.bulk_create(new_busy_times, batch_size=500, ignore_conflicts=True)
+                # bulk_create skips model signals, so invalidate explicitly and recalculate once
+                mark_user_groups_stale([request.user.id], changed_days)
+                if settings.BUSY_TIME_COALESCE:
+                    coalesce_busy_times([request.user.id], changed_days)
+            self.recalculate_user_groups(days=changed_days)
         
         response_data = {
-            'message': f'Created {len(created_busy_times)} busy times',
-            'created_count': len(created_busy_times),
+            'message': f'Created {len(requested_keys)} busy times',
+            'created_count': len(requested_keys),
+            'inserted_count': len(new_busy_times),
             'total_requested': len(busy_times_data)
         }
         
         if errors:
             response_data['errors'] = errors
         
-        return Response(response_data, status=status.HTTP_201_CREATED if created_busy_times else status.HTTP_400_BAD_REQUEST)
+        return Response(response_data, status=status.HTTP_201_CREATED if keys else status.HTTP_400_BAD_REQUEST)
+
+    @action(detail=False, methods=['put'], url_path='week')
+    def replace_week(self, request):
+        """
+        Replace the user's whole week with the given busy times.
+        Only the difference against the stored rows is written, in one transaction,
+        and groups are recalculated once for the days that actually changed.
+        """
+        busy_times_data = request.data.get('busy_times', [])
+        
+        if len(busy_times_data) > MAX_BATCH_SIZE:
+            return Response({'error': f'Too many busy times in one request. Maximum {MAX_BATCH_SIZE} allowed.'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        keys, errors = self.validate_busy_times(busy_times_data)
+        if errors:
+            # Never apply a partial week
+            return Response({'error': 'Invalid busy times', 'errors': errors}, status=status.HTTP_400_BAD_REQUEST)
+        if settings.BUSY_TIME_COALESCE:
+            # Store one row per block; rows left over from before coalescing are replaced too
+            keys = merge_keys(keys)
+        
+        desired = set(keys)
+        existing = {
+            (day_of_week, start_time, end_time): busy_time_id
+            for busy_time_id, day_of_week, start_time, end_time in BusyTime.objects.filter(
+                user=request.user
+            ).values_list('id', 'day_of_week', 'start_time', 'end_time')
+        }
+        to_delete = [busy_time_id for key, busy_time_id in existing.items() if key not in desired]
+        to_insert = [
+            BusyTime(user=request.user, day_of_week=day_of_week, start_time=start_time, end_time=end_time)
+            for day_of_week, start_time, end_time in keys
+            if (day_of_week, start_time, end_time) not in existing
+        ]
+        changed_days = sorted(
+            {key[0] for key in existing if key not in desired} | {busy_time.day_of_week for busy_time in to_insert}
+        )
+        
+        if changed_days:
+            with transaction.atomic(), deferred_invalidation():
+                BusyTime.objects.filter(id__in=to_delete).delete()
+                BusyTime.objects.bulk_create(to_insert, batch_size=500)
+                # bulk_create skips model signals
+                mark_user_groups_stale([request.user.id], changed_days)
+            self.recalculate_user_groups(days=changed_days)
+        
+        return Response({
+            'message': f'Week updated: {len(to_insert)} added, {len(to_delete)} removed',
+            'created_count': len(to_insert),
+            'deleted_count': len(to_delete),
+            'unchanged_count': len(desired) - len(to_insert),
+            'changed_days': changed_days
+        })
 
 
 # Keep AvailabilityViewSet for backward compatibility during migration
-class AvailabilityViewSet(viewsets.ModelViewSet):
+class AvailabilityViewSet(viewsets.GenericViewSet):
+    """
+    Legacy availability endpoint, served as the complement of the user's busy
+    times. Nothing is stored in Availability any more: writes are translated into
+    busy time changes, and groups are only recalculated when those really change.
+    Ids are the minute of the week an available interval starts at.
+    """
     serializer_class = AvailabilitySerializer
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        return Availability.objects.filter(user=self.request.user)
-
-    def perform_create(self, serializer):
-        serializer.save()
-        # Recalculate group availability for all groups this user is part of
-        self.recalculate_user_groups()
-
-    def perform_update(self, serializer):
-        serializer.save()
-        # Recalculate group availability for all groups this user is part of
-        self.recalculate_user_groups()
-
-    def perform_destroy(self, instance):
-        instance.delete()
-        # Recalculate group availability for all groups this user is part of
-        self.recalculate_user_groups()
-
-    def recalculate_user_groups(self):
-        """Recalculate availability for all groups this user belongs to"""
-        user_groups = Group.objects.filter(
-            Q(creator=self.request.user) | Q(members=self.request.user)
-        ).distinct()
-        
-        for group in user_groups:
-            calculate_group_free_time(group)
+        return availability_rows(self.request.user.id)
+
+    def get_object(self):
+        availability_id = self.kwargs['pk']
+        for availability in self.get_queryset():
+            if str(availability.id) == availability_id:
+                return availability
+        raise Http404
+
+    def list(self, request):
+        rows = self.get_queryset()
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(self.get_serializer(page, many=True).data)
+        return Response(self.get_serializer(rows, many=True).data)
+
+    def retrieve(self, request, pk=None):
+        return Response(self.get_serializer(self.get_object()).data)
+
+    def create(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        day_of_week = data['day_of_week']
+        interval = interval_minutes(data['start_time'], data['end_time'])
+        self.change_days({day_of_week: {'free': [interval]}})
+        # Respond with the available interval the new one became part of
+        for covering in self.get_queryset():
+            start, end = interval_minutes(covering.start_time, covering.end_time)
+            if covering.day_of_week == day_of_week and start <= interval[0] and end >= interval[1]:
+                break
+        return Response(self.get_serializer(covering).data, status=status.HTTP_201_CREATED)
+
+    def update(self, request, pk=None, partial=False):
+        instance = self.get_object()
+        serializer = self.get_serializer(instance, data=request.data, partial=partial)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        day_of_week = data.get('day_of_week', instance.day_of_week)
+        old_interval = interval_minutes(instance.start_time, instance.end_time)
+        new_interval = interval_minutes(data.get('start_time', instance.start_time), data.get('end_time', instance.end_time))
+        changes = defaultdict(lambda: {'busy': [], 'free': []})
+        changes[instance.day_of_week]['busy'].append(old_interval)
+        changes[day_of_week]['free'].append(new_interval)
+        self.change_days(changes)
+        return Response(self.get_serializer(Availability(
+            id=availability_id(day_of_week, new_interval[0]),
+            user=request.user,
+            day_of_week=day_of_week,
+            start_time=minute_to_time(new_interval[0]),
+            end_time=minute_to_time(new_interval[1])
+        )).data)
+
+    def partial_update(self, request, pk=None):
+        return self.update(request, pk, partial=True)
+
+    def destroy(self, request, pk=None):
+        instance = self.get_object()
+        self.change_days({instance.day_of_week: {'busy': [interval_minutes(instance.start_time, instance.end_time)]}})
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    def change_days(self, changes):
+        """
+        Apply {day_of_week: {'busy': [...], 'free': [...]}} interval changes to the
+        user's busy times in one transaction and recalculate the days that changed
+        """
+        user_id = self.request.user.id
+        with transaction.atomic(), deferred_invalidation():
+            changed_days = [
+                day_of_week for day_of_week, change in sorted(changes.items()) if change_day(user_id, day_of_week, **change)
+            ]
+        if changed_days:
+            schedule_recompute(user_group_ids([user_id]), changed_days)
+        return changed_days
 
     @action(detail=False, methods=['delete'])
     def clear_all(self, request):
-        """Clear all availability for the current user"""
-        count = self.get_queryset().count()
-        self.get_queryset().delete()
-        # Recalculate group availability for all groups this user is part of
-        self.recalculate_user_groups()
-        return Response({'message': f'Deleted {count} availability slots'})
+        """Clear all availability for the current user, i.e. mark the whole week busy"""
+        rows = self.get_queryset()
+        changes = defaultdict(lambda: {'busy': []})
+        for availability in rows:
+            changes[availability.day_of_week]['busy'].append(
+                interval_minutes(availability.start_time, availability.end_time)
+            )
+        self.change_days(changes)
+        return Response({'message': f'Deleted {len(rows)} availability slots'})
 
 
 class GroupViewSet(viewsets.ModelViewSet):
@@ -228,9 +383,22 @@ class GroupViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        return Group.objects.filter(
+        queryset = Group.objects.filter(
             Q(creator=self.request.user) | Q(members=self.request.user)
         ).distinct()
+        if self.action == 'list':
+            # Everything the serializer needs, including availability_status, in a fixed number of queries
+            queryset = queryset.select_related('creator', 'availability_state').prefetch_related('members').annotate(
+                has_recompute_job=Exists(RecomputeJob.objects.filter(group=OuterRef('pk')))
+            )
+        return queryset
+
+    def perform_update(self, serializer):
+        previous_slot_minutes = serializer.instance.slot_minutes
+        group = serializer.save()
+        # Changing the resolution invalidates every stored slot
+        if group.slot_minutes != previous_slot_minutes:
+            schedule_recompute([group.id])
 
     @action(detail=True, methods=['post'])
     def add_member(self, request, pk=None):
@@ -255,8 +423,8 @@ class GroupViewSet(viewsets.ModelViewSet):
                     status=status.HTTP_400_BAD_REQUEST
                 )
             
-            group.members.add(user)
-            calculate_group_free_time(group)
+            if not update_membership(group, user, joined=True):
+                schedule_recompute([group.id])
             
             return Response({'message': f'User {user.username} added to group'})
         
@@ -285,22 +453,186 @@ class GroupViewSet(viewsets.ModelViewSet):
                     status=status.HTTP_400_BAD_REQUEST
                 )
             
-            group.members.remove(user)
-            calculate_group_free_time(group)
+            if not update_membership(group, user, joined=False):
+                schedule_recompute([group.id])
             
             return Response({'message': f'User {user.username} removed from group'})
         
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+    def viewer_offset(self, request):
+        """Results are stored in UTC and returned in the viewer's own zone"""
+        return user_offsets([request.user.id])[request.user.id]
+
+    def stored_state(self, request, group):
+        """
+        The group's stored availability state, rebuilt first if something changed since.
+        """
+        state = GroupAvailabilityState.objects.filter(group=group).first()
+        if state is not None and is_current(state, group):
+            return state
+        if settings.RECOMPUTE_IN_BACKGROUND and state is not None and has_counts(state):
+            # Serve the previous result while the worker catches up
+            enqueue_recompute([group.id])
+            return state
+        # One request recomputes while concurrent ones wait for it, or with
+        # ?allow_stale=1 are served the previous result right away
+        allow_stale = request.query_params.get('allow_stale') in ('1', 'true')
+        return refresh_group_availability(group, wait=not allow_stale)
+
     @action(detail=True, methods=['get'])
     def availability(self, request, pk=None):
-        """Get common availability for the group"""
+        """
+        Get common availability for the group.
+        Rows are free intervals; pass ?granularity=slot for one row per slot.
+        """
         group = self.get_object()
-        calculate_group_free_time(group)
+        state = self.stored_state(request, group)
         
-        common_availability = GroupAvailability.objects.filter(group=group)
+        common_availability = expand_group_availability(
+            state, per_slot=request.query_params.get('granularity') == 'slot', offset=self.viewer_offset(request)
+        )
         serializer = GroupAvailabilitySerializer(common_availability, many=True)
-        return Response(serializer.data)
+        response = Response(serializer.data)
+        response['X-Availability-Status'] = availability_status(group)
+        response['X-Availability-Generation'] = state.generation
+        return response
+
+    @action(detail=True, methods=['get'])
+    def heatmap(self, request, pk=None):
+        """
+        How many members are free in every slot of the week, one list per day.
+        Pass ?min_free=k to also list the slots where at least k members are free.
+        """
+        group = self.get_object()
+        min_free = request.query_params.get('min_free')
+        if min_free is not None:
+            try:
+                min_free = int(min_free)
+            except ValueError:
+                return Response({'error': 'min_free must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+            if min_free < 1:
+                return Response({'error': 'min_free must be at least 1'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        state = self.stored_state(request, group)
+        per_day = MINUTES_PER_DAY // state.slot_minutes
+        offset = self.viewer_offset(request)
+        counts = free_counts(state, offset).tolist()
+        response_data = {
+            'slot_minutes': state.slot_minutes,
+            'member_count': state.member_count,
+            'free_counts': [counts[day * per_day:(day + 1) * per_day] for day in range(DAYS_PER_WEEK)]
+        }
+        if min_free is not None:
+            response_data['min_free'] = min_free
+            response_data['slots'] = [
+                {
+                    'day_of_week': day_of_week,
+                    'start_time': minute_to_time(start),
+                    'end_time': minute_to_time(end),
+                    'free_count': free_count
+                }
+                for day_of_week, start, end, free_count in quorum_slots(state, min_free, offset)
+            ]
+        
+        response = Response(response_data)
+        response['X-Availability-Status'] = availability_status(group)
+        return response
+
+    @action(detail=True, methods=['get'])
+    def best_windows(self, request, pk=None):
+        """
+        The best ?duration=<minutes> meeting windows of the week, ranked by how many
+        members are free for the whole window, then by earliest start.
+        Optional: ?days=0,2,4, ?start_time=09:00&end_time=18:00, ?min_attendance=<members>, ?limit=<windows>.
+        """
+        group = self.get_object()
+        serializer = BestWindowsSerializer(data=request.query_params)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        params = serializer.validated_data
+        
+        start = start_minute(params['start_time']) if 'start_time' in params else 0
+        end = MINUTES_PER_DAY
+        # 23:59 stands for the end of the day, as it does for busy times
+        if params.get('end_time', END_OF_DAY) != END_OF_DAY:
+            end = end_minute(params['end_time'])
+        
+        state = self.stored_state(request, group)
+        windows = rank_windows(
+            state, params['duration'], params.get('days'), start, end, params['min_attendance'], params['limit'],
+            self.viewer_offset(request)
+        )
+        response = Response({
+            'duration': params['duration'],
+            'member_count': state.member_count,
+            'windows': [
+                {
+                    'day_of_week': day_of_week,
+                    'start_time': minute_to_time(window_start),
+                    'end_time': minute_to_time(window_end),
+                    'attendance': attendance
+                }
+                for day_of_week, window_start, window_end, attendance in windows
+            ]
+        })
+        response['X-Availability-Status'] = availability_status(group)
+        return response
+
+    @action(detail=True, methods=['get'])
+    def free_time(self, request, pk=None):
+        """
+        Free time on concrete dates: ?start_date=YYYY-MM-DD&end_date=YYYY-MM-DD.
+        The weekly free time minus the events of this group and of the members' other groups.
+        """
+        group = self.get_object()
+        serializer = DateRangeSerializer(data=request.query_params)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        start_date = serializer.validated_data['start_date']
+        end_date = serializer.validated_data['end_date']
+        
+        state = self.stored_state(request, group)
+        zone = user_zone(request.user.id)
+        busy = member_event_intervals(group_member_ids(group), start_date, end_date, zone)
+        response = Response([
+            {
+                'date': date,
+                'day_of_week': date.weekday(),
+                'start_time': minute_to_time(start),
+                'end_time': minute_to_time(end),
+                'member_count': state.member_count
+            }
+            for date, start, end in iter_free_dates(state, zone, busy, start_date, end_date)
+        ])
+        response['X-Availability-Status'] = availability_status(group)
+        return response
+
+    @action(detail=False, methods=['post'])
+    def common_free_time(self, request):
+        """
+        Common free time for any set of users, without creating a group.
+        Only yourself and people who share a group with you can be included.
+        Pass ?granularity=slot for one row per slot.
+        """
+        serializer = CommonFreeTimeSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        user_ids = sorted(set(serializer.validated_data['user_ids']))
+        slot_minutes = serializer.validated_data['slot_minutes']
+        
+        hidden = sorted(set(user_ids) - visible_user_ids(request.user.id))
+        if hidden:
+            return Response(
+                {'error': 'You can only include yourself and people who share a group with you', 'user_ids': hidden},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        
+        free_time = common_free_time(
+            user_ids, slot_minutes, per_slot=request.query_params.get('granularity') == 'slot',
+            offset=self.viewer_offset(request)
+        )
+        return Response(GroupAvailabilitySerializer(free_time, many=True).data)
 
     @action(detail=True, methods=['post'])
     def regenerate_code(self, request, pk=None):
@@ -345,8 +677,8 @@ class GroupViewSet(viewsets.ModelViewSet):
                         status=status.HTTP_400_BAD_REQUEST
                     )
                 
-                group.members.add(request.user)
-                calculate_group_free_time(group)
+                if not update_membership(group, request.user, joined=True):
+                    schedule_recompute([group.id])
                 
                 return Response({
                     'message': f'Successfully joined group "{group.name}"',
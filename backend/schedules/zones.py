@@ -0,0 +1,129 @@
+"""
+Time zone handling for weekly schedules.
+
+Busy times are entered in each user's own zone (UserProfile.timezone), while
+group results are computed and stored in UTC. Every member's weekly profile is
+rotated into UTC by their zone's current offset, wrapping around the end of
+the week, and stored vectors are rotated into the viewer's zone when served.
+"""
+
+from datetime import datetime, time
+from math import gcd
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+import numpy as np
+from django.utils import timezone
+
+from authentication.models import UserProfile
+
+from .engine import DAYS_PER_WEEK, MINUTES_PER_DAY
+from .sweep import merge_intervals
+
+
+WEEK_MINUTES = MINUTES_PER_DAY * DAYS_PER_WEEK
+
+
+def get_zone(name):
+    """ZoneInfo for a zone name; unknown zones count as UTC"""
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        return ZoneInfo('UTC')
+
+
+def zone_offset(name):
+    """Current offset of a zone from UTC in minutes"""
+    return int(timezone.now().astimezone(get_zone(name)).utcoffset().total_seconds() // 60)
+
+
+def date_offset(zone, date):
+    """Offset of a ZoneInfo from UTC in minutes on a given date, taken at midday"""
+    return int(datetime.combine(date, time(12), tzinfo=zone).utcoffset().total_seconds() // 60)
+
+
+def user_zone(user_id):
+    """ZoneInfo of a user's UserProfile.timezone"""
+    name = UserProfile.objects.filter(user_id=user_id).values_list('timezone', flat=True).first()
+    return get_zone(name or 'UTC')
+
+
+def user_zone_names(user_ids):
+    """{user_id: zone name} for those of the given users outside UTC, with one query"""
+    return dict(
+        UserProfile.objects.filter(user_id__in=user_ids).exclude(timezone='UTC').values_list('user_id', 'timezone')
+    )
+
+
+def user_offsets(user_ids, names=None):
+    """{user_id: offset in minutes} for the given users, from their user_zone_names"""
+    names = user_zone_names(user_ids) if names is None else names
+    zone_offsets = {name: zone_offset(name) for name in set(names.values())}
+    offsets = dict.fromkeys(user_ids, 0)
+    for user_id, name in names.items():
+        if user_id in offsets:
+            offsets[user_id] = zone_offsets[name]
+    return offsets
+
+
+def offsets_changed(zone_offsets, current=None):
+    """
+    Whether any zone in a {zone name: offset} record has moved since, e.g. for
+    daylight saving, against `current` offsets or else the zones' offsets now
+    """
+    if current is None:
+        return any(zone_offset(name) != offset for name, offset in zone_offsets.items())
+    return any(current.get(name, offset) != offset for name, offset in zone_offsets.items())
+
+
+def rotate_profile(profile, minutes):
+    """
+    Shift a weekly profile ([merged (start, end) intervals per day]) by `minutes`,
+    splitting intervals at midnight and wrapping around the end of the week.
+    """
+    if not minutes:
+        return profile
+    rotated = [[] for _ in range(DAYS_PER_WEEK)]
+    for day_of_week, intervals in enumerate(profile):
+        for start, end in intervals:
+            length = end - start
+            start = (day_of_week * MINUTES_PER_DAY + start + minutes) % WEEK_MINUTES
+            while length > 0:
+                day, offset = divmod(start, MINUTES_PER_DAY)
+                piece = min(length, MINUTES_PER_DAY - offset)
+                rotated[day].append((offset, offset + piece))
+                start = (start + piece) % WEEK_MINUTES
+                length -= piece
+    return [merge_intervals(intervals) for intervals in rotated]
+
+
+def utc_days(days, offsets):
+    """
+    The UTC days that local `days` of users at the given offsets can fall on:
+    a local day also reaches into the UTC day before it in zones ahead of UTC,
+    and into the day after it in zones behind
+    """
+    steps = {0} | {-1 for offset in offsets if offset > 0} | {1 for offset in offsets if offset < 0}
+    return sorted({(day_of_week + step) % DAYS_PER_WEEK for day_of_week in days for step in steps})
+
+
+def grid_minutes(slot_minutes, offsets):
+    """
+    The largest divisor of `slot_minutes` that all the given offsets are
+    multiples of: the slot size at which weekly vectors can be rotated between
+    UTC and any of those zones without cutting a slot
+    """
+    return gcd(slot_minutes, *offsets)
+
+
+def rotate_slots(values, slot_minutes, minutes):
+    """
+    Rotate a per-slot vector by `minutes` onto a slot grid aligned in the target
+    zone. A target slot straddling two source slots takes the smaller value, so
+    a slot is only reported free for the members free during all of it.
+    """
+    if not minutes:
+        return values
+    if minutes % slot_minutes == 0:
+        return np.roll(values, minutes // slot_minutes)
+    per_minute = np.roll(np.repeat(values, slot_minutes), minutes)
+    return per_minute.reshape(-1, slot_minutes).min(axis=1)
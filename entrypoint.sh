@@ -4,6 +4,13 @@ set -e
 # Change to the backend directory where manage.py is located
 cd backend
 
+# `entrypoint.sh worker` runs the background recompute worker instead of the
+# web server (see the worker service in docker-compose.yml)
+if [ "${1:-}" = "worker" ]; then
+    echo "Starting recompute worker..."
+    exec python manage.py run_recompute_worker
+fi
+
 # Apply database migrations
 echo "Applying database migrations..."
 python manage.py migrate